@@ -0,0 +1,253 @@
+import asyncio
+import re
+import shlex
+import sqlite3
+import time
+
+# since: durations, e.g. 30m, 12h, 7d, 2w
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)([smhdw])')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_duration(value):
+    """Seconds in a duration like '12h' or '1d12h'"""
+    parts = _DURATION.findall(value)
+    if not parts or ''.join(n + u for n, u in parts) != value:
+        raise ValueError(f"Invalid duration: {value}")
+    return sum(float(n) * _UNITS[u] for n, u in parts)
+
+
+def parse_query(text):
+    """Split a search query into SQL filters and a full-text match
+
+    ``type:trojan,vless port:443 host:example.com source:"Some Channel"
+    since:1d limit:50`` become column filters; every other word must
+    appear in the config text, remark, host or source (full-text match).
+    Returns (where clauses, parameters, fts match or None, limit).
+    """
+    where, params, words, limit = [], [], [], None
+    for token in shlex.split(text):
+        name, sep, value = token.partition(':')
+        name = name.lower()
+        if not sep or not value or name not in ('type', 'port', 'host', 'source', 'since', 'limit'):
+            words.append(token)
+        elif name == 'type':
+            types = [t.strip().lower() for t in value.split(',') if t.strip()]
+            where.append(f"type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+        elif name == 'port':
+            where.append('port = ?')
+            params.append(int(value))
+        elif name == 'host':
+            # The host itself or any subdomain: a range over the reversed host
+            reversed_host = value.lower()[::-1]
+            where.append('(rhost = ? OR (rhost > ? AND rhost < ?))')
+            params.extend([reversed_host, reversed_host + '.', reversed_host + '/'])
+        elif name == 'source':
+            where.append('source = ?')
+            params.append(value)
+        elif name == 'since':
+            where.append('last_seen >= ?')
+            params.append(time.time() - parse_duration(value))
+        elif name == 'limit':
+            limit = int(value)
+            if limit < 1:
+                raise ValueError(f"Invalid limit: {value}")
+    match = ' '.join('"' + word.replace('"', '""') + '"' for word in words) or None
+    return where, params, match, limit
+
+
+class ConfigArchive:
+    """SQLite archive of every extracted config, searchable by column and full text
+
+    One row per dedup key with the parsed type, host and port, the source
+    channel, first/last sighting and a sighting count. Sightings are
+    buffered and upserted in one transaction every ``flush_interval``
+    seconds (or ``max_batch`` rows), so the scan path never waits on a
+    commit. An FTS5 index over config text, remark, host and source is
+    kept in step by triggers; a repeat sighting only touches the
+    timestamps, not the index. Hosts are also stored reversed, so
+    ``host:`` filters on a domain and its subdomains are index range
+    scans. Searches run in a worker thread on their own connection, so a
+    broad full-text match does not stall the event loop. ``prune``
+    applies the retention policy: rows not seen for ``retention``
+    seconds go first, then the least recently seen ones beyond
+    ``max_rows``.
+    """
+
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+    PRUNE_INTERVAL = 3600
+    PRUNE_CHUNK = 250
+
+    def __init__(self, path, retention=30 * 86400, max_rows=0, flush_interval=2, max_batch=500):
+        self.path = path
+        self.retention = retention
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buffer = {}
+        self._timer = None
+        self._pruned_at = None
+
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS configs (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                type TEXT NOT NULL,
+                host TEXT,
+                rhost TEXT,
+                port INTEGER,
+                transport TEXT,
+                security TEXT,
+                remark TEXT,
+                source TEXT,
+                channel_id INTEGER,
+                config TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                seen_count INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS configs_type ON configs (type, last_seen);
+            CREATE INDEX IF NOT EXISTS configs_type_port ON configs (type, port, last_seen);
+            CREATE INDEX IF NOT EXISTS configs_rhost ON configs (rhost);
+            CREATE INDEX IF NOT EXISTS configs_source ON configs (source, last_seen);
+            CREATE INDEX IF NOT EXISTS configs_last_seen ON configs (last_seen);
+            CREATE VIRTUAL TABLE IF NOT EXISTS configs_fts USING fts5(
+                config, remark, host, source, content='configs', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS configs_fts_insert AFTER INSERT ON configs BEGIN
+                INSERT INTO configs_fts (rowid, config, remark, host, source)
+                VALUES (new.id, new.config, new.remark, new.host, new.source);
+            END;
+            CREATE TRIGGER IF NOT EXISTS configs_fts_delete AFTER DELETE ON configs BEGIN
+                INSERT INTO configs_fts (configs_fts, rowid, config, remark, host, source)
+                VALUES ('delete', old.id, old.config, old.remark, old.host, old.source);
+            END;
+        ''')
+        self._db.commit()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM configs').fetchone()[0]
+
+    def add(self, key, server_type, config_text, parsed=None, source=None, channel_id=None):
+        """Record a sighting of a config (with its ParsedConfig, if any)"""
+        now = time.time()
+        row = self._buffer.get(key)
+        if row is not None:
+            # Seen again before the flush: only the count and last sighting change
+            row[-1] += 1
+            row[-2] = now
+            return
+        self._buffer[key] = [
+            key, server_type,
+            parsed.host if parsed else None,
+            parsed.host[::-1] if parsed else None,
+            parsed.port if parsed else None,
+            parsed.transport if parsed else None,
+            parsed.security if parsed else None,
+            parsed.remark if parsed else None,
+            source, channel_id, config_text, now, now, 1
+        ]
+        if len(self._buffer) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            try:
+                self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+            except RuntimeError:
+                self.flush()
+
+    def flush(self):
+        """Upsert buffered sightings in one transaction"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        rows, self._buffer = list(self._buffer.values()), {}
+        with self._db:
+            self._db.executemany(
+                'INSERT INTO configs (key, type, host, rhost, port, transport, security, remark, '
+                'source, channel_id, config, first_seen, last_seen, seen_count) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET last_seen = excluded.last_seen, '
+                'seen_count = seen_count + excluded.seen_count',
+                rows
+            )
+
+    def _search(self, sql, params):
+        # Runs in a worker thread; WAL lets it read alongside the writer
+        db = sqlite3.connect(self.path)
+        try:
+            return db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+
+    async def search(self, query='', limit=None, max_limit=None):
+        """Rows matching a query (see ``parse_query``), most recently seen first
+
+        A ``limit:`` in the query wins over ``limit``; either is capped at
+        ``max_limit`` (MAX_LIMIT by default).
+        """
+        self.flush()
+        where, params, match, query_limit = parse_query(query)
+        limit = min(query_limit or limit or self.DEFAULT_LIMIT, max_limit or self.MAX_LIMIT)
+        sql = (
+            'SELECT type, host, port, source, config, first_seen, last_seen, seen_count '
+            'FROM configs'
+        )
+        if match is not None:
+            where.insert(0, 'id IN (SELECT rowid FROM configs_fts WHERE configs_fts MATCH ?)')
+            params.insert(0, match)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY last_seen DESC LIMIT ?'
+        return await asyncio.to_thread(self._search, sql, params + [limit])
+
+    def _prune(self, cutoff, max_rows):
+        # Runs in a worker thread on its own connection; chunks keep each write lock short
+        db = sqlite3.connect(self.path, timeout=30)
+        removed = 0
+        try:
+            while cutoff is not None:
+                with db:
+                    count = db.execute(
+                        'DELETE FROM configs WHERE id IN '
+                        '(SELECT id FROM configs WHERE last_seen < ? LIMIT ?)',
+                        (cutoff, self.PRUNE_CHUNK)
+                    ).rowcount
+                removed += count
+                if count < self.PRUNE_CHUNK:
+                    break
+            if max_rows:
+                excess = db.execute('SELECT COUNT(*) FROM configs').fetchone()[0] - max_rows
+                while excess > 0:
+                    with db:
+                        count = db.execute(
+                            'DELETE FROM configs WHERE id IN '
+                            '(SELECT id FROM configs ORDER BY last_seen LIMIT ?)',
+                            (min(excess, self.PRUNE_CHUNK),)
+                        ).rowcount
+                    removed += count
+                    excess -= count
+            # Refresh the planner statistics the search queries rely on
+            db.execute('PRAGMA optimize')
+        finally:
+            db.close()
+        return removed
+
+    async def prune(self, force=False):
+        """Apply the retention policy (at most every PRUNE_INTERVAL), returns removed count"""
+        if not force and self._pruned_at is not None and time.monotonic() - self._pruned_at < self.PRUNE_INTERVAL:
+            return 0
+        self._pruned_at = time.monotonic()
+        self.flush()
+        cutoff = time.time() - self.retention if self.retention else None
+        return await asyncio.to_thread(self._prune, cutoff, self.max_rows)
+
+    def close(self):
+        self.flush()
+        self._db.close()
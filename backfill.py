@@ -0,0 +1,103 @@
+import asyncio
+import time
+from rate_limiter import TokenBucket
+
+
+class Backfill:
+    """Walks channel history backwards, below what live scanning has seen
+
+    Each channel keeps a backward cursor (the oldest message id processed)
+    in the state store, so a stopped or interrupted backfill resumes where
+    it left off. Pages of ``chunk_size`` messages are fetched newest-first
+    below the cursor; a short page means the start of the channel was
+    reached. Throughput is held at ``rate`` messages per minute by a token
+    bucket, and the walk pauses between pages while ``idle`` is clear (a
+    live scan batch is running), so it only uses capacity live scanning
+    leaves over.
+    """
+
+    def __init__(self, store, rate, chunk_size, max_messages=0, key='backfill'):
+        self.store = store
+        self.key = key
+        self.chunk_size = chunk_size
+        self.max_messages = max_messages
+        self.bucket = TokenBucket(rate / 60, chunk_size)
+        self.idle = asyncio.Event()
+        self.idle.set()
+        saved = store.get(key, {})
+        # channel id -> {'offset': oldest id processed (0 = none yet), 'messages': n, 'done': bool}
+        self._cursors = {int(k): v for k, v in saved.get('cursors', {}).items()}
+        self.queue = [int(channel_id) for channel_id in saved.get('queue', [])]
+        self.current = None
+        self.messages = 0
+        self.started_at = None
+
+    def configure(self, rate, chunk_size, max_messages):
+        self.chunk_size = chunk_size
+        self.max_messages = max_messages
+        self.bucket.set_rate(rate / 60, chunk_size)
+
+    def cursor(self, channel_id):
+        return self._cursors.get(channel_id)
+
+    def done(self, channel_id):
+        cursor = self._cursors.get(channel_id)
+        return cursor is not None and cursor['done']
+
+    def rate(self):
+        """Messages per minute processed since the current run started"""
+        if not self.started_at:
+            return 0.0
+        return self.messages * 60 / max(1.0, time.monotonic() - self.started_at)
+
+    def save(self):
+        self.store.update(**{self.key: {
+            'cursors': {str(k): v for k, v in self._cursors.items()},
+            'queue': self.queue
+        }})
+
+    async def run(self, channels, scan_page, start_offset):
+        """Backfill channels in order until each reaches its start (or max_messages)
+
+        ``scan_page(channel, offset_id, limit)`` processes up to ``limit``
+        messages older than ``offset_id`` and returns (messages fetched,
+        oldest id processed), or None to leave the channel for a later run.
+        ``start_offset(channel)`` is where a new channel's walk begins.
+        """
+        self.queue = [channel['id'] for channel in channels]
+        self.messages = 0
+        self.started_at = time.monotonic()
+        self.save()
+        try:
+            for channel in channels:
+                self.current = channel
+                cursor = self._cursors.setdefault(
+                    channel['id'],
+                    {'offset': start_offset(channel), 'messages': 0, 'done': False}
+                )
+                while not cursor['done']:
+                    await self.idle.wait()
+                    limit = self.chunk_size
+                    if self.max_messages:
+                        limit = min(limit, self.max_messages - cursor['messages'])
+                    if limit <= 0:
+                        cursor['done'] = True
+                        break
+
+                    result = await scan_page(channel, cursor['offset'], limit)
+                    if result is None:
+                        break
+                    fetched, oldest = result
+                    if fetched:
+                        cursor['offset'] = oldest
+                        cursor['messages'] += fetched
+                        self.messages += fetched
+                    if fetched < limit:
+                        cursor['done'] = True
+                    await self.bucket.acquire(min(max(1, fetched), self.bucket.capacity))
+
+                self.queue.remove(channel['id'])
+                self.save()
+        finally:
+            self.current = None
+            self.save()
@@ -0,0 +1,200 @@
+import asyncio
+from datetime import datetime
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+# forward_messages accepts at most this many ids per call
+MAX_FORWARD_IDS = 100
+
+
+def pack_messages(header, entries, limit=MAX_MESSAGE_LENGTH):
+    """Like ``pack_entries``, as (message, entries completed in it) pairs
+
+    An entry too long for a message of its own is split across several;
+    it counts towards the message holding its last part.
+    """
+    messages = []
+    current = header
+    count = 0
+    room = max(1, limit - len(header))
+    for entry in entries:
+        if count and len(current) + len(entry) > limit:
+            messages.append((current.rstrip(), count))
+            current, count = header, 0
+        while len(entry) > room:
+            messages.append(((header + entry[:room]).rstrip(), 0))
+            entry = entry[room:]
+        current += entry
+        count += 1
+    if count:
+        messages.append((current.rstrip(), count))
+    return messages
+
+
+def pack_entries(header, entries, limit=MAX_MESSAGE_LENGTH):
+    """Split entries into as few messages as fit under the length limit"""
+    return [message for message, _ in pack_messages(header, entries, limit)]
+
+
+class ForwardBatcher:
+    """Coalesces configs and files bound for the target group
+
+    Configs are grouped by server type and packed into as few messages as
+    Telegram's length limit allows. Files are grouped by source channel and
+    forwarded with one ``forward_messages`` call per channel, followed by a
+    single caption listing them. A batch is flushed as soon as it holds
+    ``max_items`` entries or, failing that, every ``max_delay`` seconds.
+
+    The callbacks are ``send_text(text)``, ``forward_files(channel_id, ids)``,
+    ``on_sent(seen_keys)`` and ``on_error(exception)``. When a ``prober`` is
+    set, configs are probed at flush time: unreachable servers are dropped
+    and the rest are sent fastest first with their measured RTT. When
+    ``on_settled`` is set it is called with every key that was sent or
+    dropped by the prober. Keys are marked sent message by message, so a
+    failure part way through a batch only leaves the rest unsent: they
+    leave the batch without being settled, and can be replayed.
+    """
+
+    def __init__(self, send_text, forward_files, on_sent, on_error, max_items=20, max_delay=5):
+        self.prober = None
+        self.on_settled = None
+        self.send_text = send_text
+        self.forward_files = forward_files
+        self.on_sent = on_sent
+        self.on_error = on_error
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._configs = {}
+        self._files = {}
+        self._pending_keys = set()
+        self._lock = asyncio.Lock()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending_keys)
+
+    def is_pending(self, seen_key):
+        return seen_key in self._pending_keys
+
+    async def add_config(self, server_type, config, source, seen_key, parsed=None):
+        """Queue a server config (with its ParsedConfig, if any, for probing)"""
+        self._pending_keys.add(seen_key)
+        self._configs.setdefault(server_type, []).append((config, source, seen_key, parsed))
+        if len(self) >= self.max_items:
+            await self.flush()
+
+    async def add_file(self, channel_id, source, file_info, seen_key):
+        """Queue a file message (a FoundFile) for forwarding"""
+        self._pending_keys.add(seen_key)
+        self._files.setdefault(channel_id, []).append((source, file_info, seen_key))
+        if len(self) >= self.max_items:
+            await self.flush()
+
+    async def flush(self):
+        """Send everything that is queued"""
+        async with self._lock:
+            configs, self._configs = self._configs, {}
+            files, self._files = self._files, {}
+
+            for server_type, items in configs.items():
+                await self._send_configs(server_type, items)
+            for channel_id, items in files.items():
+                await self._send_files(channel_id, items)
+
+    async def _probe(self, items):
+        """Drop unreachable servers and order the rest by latency"""
+        results = await self.prober.probe_many([parsed for *_, parsed in items])
+        ranked = []
+        for index, (item, result) in enumerate(zip(items, results)):
+            if result is None:
+                # Not probeable over TCP (UDP, unparsed): keep, after live ones
+                ranked.append((float('inf'), index, item, None))
+            elif result.ok:
+                ranked.append((result.rtt, index, item, result.rtt))
+        ranked.sort()
+        return [(item, rtt) for _, _, item, rtt in ranked]
+
+    async def _send_configs(self, server_type, items):
+        all_keys = [seen_key for _, _, seen_key, _ in items]
+        try:
+            if self.prober is not None:
+                probed = await self._probe(items)
+            else:
+                probed = [(item, None) for item in items]
+            # Servers the prober dropped are settled without being sent
+            kept = {item[2] for item, _ in probed}
+            self._settle([key for key in all_keys if key not in kept])
+            if not probed:
+                return
+
+            sources = ', '.join(sorted({item[1] for item, _ in probed}))
+            header = (
+                f"🔒 **{server_type.upper()} Servers** ({len(probed)})\n\n"
+                f"📡 Source: {sources}\n"
+                f"⏰ Found: {datetime.now().strftime('%H:%M:%S')}\n\n"
+            )
+            entries = []
+            for (config, _, _, _), rtt in probed:
+                latency = f"⚡ {rtt * 1000:.0f} ms\n" if rtt is not None else ''
+                entries.append(f"{latency}```\n{config}\n```\n")
+
+            sent = 0
+            for text, count in pack_messages(header, entries):
+                await self.send_text(text)
+                keys = [item[2] for item, _ in probed[sent:sent + count]]
+                sent += count
+                self.on_sent(keys)
+                self._settle(keys)
+        except Exception as e:
+            await self.on_error(e)
+        finally:
+            self._pending_keys.difference_update(all_keys)
+
+    async def _send_files(self, channel_id, items):
+        source = items[0][0]
+        header = (
+            f"📁 **VPN Config Files** ({len(items)})\n\n"
+            f"📡 Source: {source}\n"
+            f"⏰ Found: {datetime.now().strftime('%H:%M:%S')}\n\n"
+        )
+        entries = [
+            f"📄 `{file_info.filename}` ({file_info.size} bytes)\n"
+            for _, file_info, _ in items
+        ]
+        try:
+            # Forwarded files count as sent even if the caption fails
+            for i in range(0, len(items), MAX_FORWARD_IDS):
+                chunk = items[i:i + MAX_FORWARD_IDS]
+                await self.forward_files(channel_id, [file_info.message_id for _, file_info, _ in chunk])
+                keys = [seen_key for _, _, seen_key in chunk]
+                self.on_sent(keys)
+                self._settle(keys)
+            for text in pack_entries(header, entries):
+                await self.send_text(text)
+        except Exception as e:
+            await self.on_error(e)
+        finally:
+            self._pending_keys.difference_update(seen_key for _, _, seen_key in items)
+
+    def _settle(self, keys):
+        self._pending_keys.difference_update(keys)
+        if self.on_settled is not None:
+            self.on_settled(keys)
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self.max_delay)
+            if len(self):
+                await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._run_timer())
+
+    async def close(self):
+        """Stop the flush task and send whatever is left"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
@@ -0,0 +1 @@
+"""Offline benchmarks for the VPN scanner (run with ``python -m benchmarks.<name>``)"""
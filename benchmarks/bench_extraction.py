@@ -0,0 +1,51 @@
+import argparse
+import re
+import time
+
+import config
+from extractor import ConfigExtractor
+from benchmarks.corpus import make_corpus
+
+
+def legacy_extract(text, server_types):
+    """Previous VPNScanner.extract_vpn_configs: one re.findall per pattern"""
+    found_configs = []
+    for server_type in server_types:
+        if server_type not in config.VPN_PATTERNS:
+            continue
+        for pattern in config.VPN_PATTERNS[server_type]:
+            for match in re.findall(pattern, text, re.IGNORECASE | re.MULTILINE):
+                found_configs.append({'type': server_type, 'config': match.strip()})
+    return found_configs
+
+
+def run(name, func, corpus, rounds):
+    total_bytes = sum(len(text) for text in corpus) * rounds
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            hits += len(func(text))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} {elapsed:8.3f}s  {len(corpus) * rounds / elapsed:10.0f} msg/s  "
+        f"{total_bytes / elapsed / 1e6:7.2f} MB/s  {hits // rounds} hits/round"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction throughput benchmark")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    server_types = config.DEFAULT_SETTINGS["ENABLED_SERVER_TYPES"]
+    corpus = make_corpus(args.messages)
+    extractor = ConfigExtractor(server_types)
+
+    run("legacy", lambda text: legacy_extract(text, server_types), corpus, args.rounds)
+    run("compiled", extractor.extract, corpus, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
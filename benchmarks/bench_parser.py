@@ -0,0 +1,35 @@
+import argparse
+import time
+
+import config
+from config_parser import parse_config
+from extractor import ConfigExtractor
+from benchmarks.corpus import make_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Config parser throughput benchmark")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    extractor = ConfigExtractor(config.DEFAULT_SETTINGS["ENABLED_SERVER_TYPES"])
+    found = [hit for text in make_corpus(args.messages, config_ratio=1.0) for hit in extractor.extract(text)]
+
+    parsed = failed = 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for hit in found:
+            if parse_config(hit['type'], hit['config']) is None:
+                failed += 1
+            else:
+                parsed += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"configs    {len(found)} x {args.rounds} rounds")
+    print(f"parsed     {parsed // args.rounds} per round, {failed // args.rounds} unparseable")
+    print(f"throughput {parsed / elapsed:10.0f} records/s  ({elapsed / max(parsed, 1) * 1e6:.1f} us/record)")
+
+
+if __name__ == "__main__":
+    main()
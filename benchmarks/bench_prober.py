@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import socket
+import time
+
+from config_parser import ParsedConfig
+from prober import ServerProber
+
+
+def closed_port():
+    """A local port with nothing listening on it"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(args):
+    async def accept(reader, writer):
+        await asyncio.sleep(args.hold)
+        writer.close()
+
+    servers = [await asyncio.start_server(accept, "127.0.0.1", 0) for _ in range(args.listeners)]
+    live_ports = [server.sockets[0].getsockname()[1] for server in servers]
+    dead_ports = [closed_port() for _ in range(args.dead)]
+
+    configs = [ParsedConfig("vless", "127.0.0.1", port) for port in live_ports + dead_ports]
+
+    prober = ServerProber(concurrency=args.concurrency, timeout=2, cache_ttl=0)
+    start = time.perf_counter()
+    results = await prober.probe_many(configs)
+    cold = time.perf_counter() - start
+
+    prober.cache_ttl = 600
+    await prober.probe_many(configs)
+    start = time.perf_counter()
+    await prober.probe_many(configs)
+    warm = time.perf_counter() - start
+
+    live = [r for r in results if r.ok]
+    rtts = sorted(r.rtt for r in live)
+    print(f"endpoints  {len(configs)} ({len(live)} live, {len(results) - len(live)} dead)")
+    print(f"cold       {cold:.3f}s  {len(configs) / cold:8.0f} probes/s")
+    print(f"cached     {warm:.3f}s  {len(configs) / warm:8.0f} probes/s")
+    if rtts:
+        print(f"rtt p50    {rtts[len(rtts) // 2] * 1000:.2f} ms")
+
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prober benchmark against local listeners")
+    parser.add_argument("--listeners", type=int, default=400)
+    parser.add_argument("--dead", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--hold", type=float, default=0.01)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import time
+
+import config
+from extractor import ConfigExtractor
+from subscription import SubscriptionExpander
+from benchmarks.corpus import make_corpus
+
+
+def run(name, func, corpus, rounds):
+    found = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            found += func(text)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} {elapsed:8.3f}s  {elapsed / (len(corpus) * rounds) * 1e6:8.1f} us/msg  "
+        f"{found // rounds} configs/round"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subscription blob expansion benchmark")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--blob-ratio", type=float, default=0.1, help="share of posts with a blob (half are decoys)")
+    args = parser.parse_args()
+
+    extractor = ConfigExtractor(config.DEFAULT_SETTINGS["ENABLED_SERVER_TYPES"])
+    expander = SubscriptionExpander(extractor)
+    corpus = make_corpus(args.messages, blob_ratio=args.blob_ratio)
+    plain = make_corpus(args.messages)
+
+    def extract(text):
+        return len(list(extractor.finditer(text)))
+
+    def expand(text):
+        return extract(text) + len(expander.expand(text))
+
+    run("plain", extract, plain, args.rounds)
+    run("plain+exp", expand, plain, args.rounds)
+    run("blobs", extract, corpus, args.rounds)
+    run("blobs+exp", expand, corpus, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import base64
+import json
+import random
+import uuid
+
+WORDS = (
+    "free fast server update today channel join share vpn config best "
+    "speed unlimited iran germany netherlands ping ok working new test"
+).split()
+
+
+def _b64(data):
+    return base64.b64encode(data.encode()).decode()
+
+
+def _host(rng):
+    return f"{rng.choice(['de', 'nl', 'fr', 'us'])}{rng.randint(1, 99)}.example{rng.randint(1, 9)}.com"
+
+
+def make_vmess(rng):
+    payload = json.dumps({
+        "v": "2", "ps": f"srv-{rng.randint(1, 999)}", "add": _host(rng),
+        "port": str(rng.choice([443, 80, 8443, 2053])), "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "aid": "0", "net": rng.choice(["ws", "tcp", "grpc"]), "type": "none",
+        "host": "", "path": "/", "tls": rng.choice(["tls", ""]),
+    })
+    return f"vmess://{_b64(payload)}"
+
+
+def make_vless(rng):
+    uid = uuid.UUID(int=rng.getrandbits(128))
+    return (f"vless://{uid}@{_host(rng)}:{rng.choice([443, 80, 8443])}"
+            f"?encryption=none&security=tls&type=ws&path=%2F#vless-{rng.randint(1, 999)}")
+
+
+def make_trojan(rng):
+    return f"trojan://{rng.getrandbits(64):x}@{_host(rng)}:443?sni={_host(rng)}#trojan-{rng.randint(1, 999)}"
+
+
+def make_ss(rng):
+    cred = _b64(f"chacha20-ietf-poly1305:{rng.getrandbits(48):x}")
+    return f"ss://{cred}@{_host(rng)}:{rng.randint(1000, 65000)}#ss-{rng.randint(1, 999)}"
+
+
+def make_wireguard(rng):
+    return (
+        "[Interface]\n"
+        f"PrivateKey = {_b64(str(rng.getrandbits(128)))}\n"
+        f"Address = 10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}/32\n"
+        "DNS = 1.1.1.1\n\n"
+        "[Peer]\n"
+        f"PublicKey = {_b64(str(rng.getrandbits(128)))}\n"
+        "AllowedIPs = 0.0.0.0/0\n"
+        f"Endpoint = {_host(rng)}:51820"
+    )
+
+
+GENERATORS = [make_vmess, make_vless, make_trojan, make_ss, make_wireguard]
+
+
+def make_subscription(rng, size=None):
+    """Base64 subscription blob of newline-separated config links"""
+    links = [rng.choice(GENERATORS[:4])(rng) for _ in range(size or rng.randint(20, 300))]
+    return _b64("\n".join(links))
+
+
+def make_decoy(rng):
+    """Long base64-alphabet run that is not a subscription (digest or random key)"""
+    if rng.random() < 0.5:
+        return "".join(rng.choice("0123456789abcdef") for _ in range(128))
+    return base64.b64encode(rng.getrandbits(8 * 96).to_bytes(96, "big")).decode()
+
+
+def make_message(rng, max_configs=4, config_ratio=0.5, blob_ratio=0.0):
+    """Build one synthetic channel post mixing chatter and config links"""
+    parts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40)))]
+    if rng.random() < config_ratio:
+        for _ in range(rng.randint(1, max_configs)):
+            parts.append(rng.choice(GENERATORS)(rng))
+            parts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 8))))
+    if rng.random() < blob_ratio:
+        parts.append(make_subscription(rng) if rng.random() < 0.5 else make_decoy(rng))
+    return "\n".join(parts)
+
+
+def make_corpus(size=2000, seed=1234, **kwargs):
+    """Deterministic list of synthetic message texts"""
+    rng = random.Random(seed)
+    return [make_message(rng, **kwargs) for _ in range(size)]
+
+
+def make_channel_corpus(channels=50, messages=200, seed=1234, **kwargs):
+    """Synthetic ``{channel_id: (title, [texts])}`` corpus"""
+    rng = random.Random(seed)
+    return {
+        i: (f"Bench Channel {i}", [make_message(rng, **kwargs) for _ in range(messages)])
+        for i in range(channels)
+    }
+
+
+def load_corpus(path):
+    """Load a recorded corpus from JSON lines of ``{"channel": ..., "text": ...}``"""
+    corpus = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            title = str(record["channel"])
+            corpus.setdefault(title, (title, []))[1].append(record.get("text") or "")
+    return corpus
@@ -0,0 +1,207 @@
+import asyncio
+import random
+from collections import Counter
+
+from telethon import errors, utils
+from telethon.tl.types import Channel, ChatPhotoEmpty, DocumentAttributeFilename
+
+
+class FakeDocument:
+    __slots__ = ('id', 'size', 'attributes', 'data')
+
+    def __init__(self, doc_id, file_name, data):
+        self.id = doc_id
+        self.data = data
+        self.size = len(data)
+        self.attributes = [DocumentAttributeFilename(file_name)]
+
+
+class FakeMessage:
+    __slots__ = ('id', 'chat_id', 'text', 'document')
+
+    def __init__(self, message_id, chat_id, text, document=None):
+        self.id = message_id
+        self.chat_id = chat_id
+        self.text = text
+        self.document = document
+
+
+class FakeDownload:
+    """Chunked download iterator, closed with ``close`` like Telethon's"""
+
+    def __init__(self, client, document, offset, request_size):
+        self.client = client
+        self.document = document
+        self.offset = offset
+        self.request_size = request_size
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed or self.offset >= self.document.size:
+            raise StopAsyncIteration
+        await self.client._api('iter_download')
+        chunk = self.document.data[self.offset:self.offset + self.request_size]
+        self.offset += len(chunk)
+        return chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeDialog:
+    def __init__(self, entity):
+        self.entity = entity
+        self.id = utils.get_peer_id(entity)
+        self.title = entity.title
+        self.is_channel = True
+        self.is_group = bool(entity.megagroup)
+
+
+class FakeUser:
+    def __init__(self, user_id, username):
+        self.id = user_id
+        self.username = username
+
+
+class FakeResult:
+    def __init__(self, chats):
+        self.chats = chats
+
+
+class FakeTelegramClient:
+    """In-process stand-in for the TelegramClient methods VPNScanner uses
+
+    Channels are replayed from a corpus (``{channel_id: (title, [texts])}``).
+    Every API method sleeps ``latency`` seconds (+/- ``jitter``) and raises
+    ``FloodWaitError(flood_seconds)`` with probability ``flood_rate``; calls
+    per method are counted in ``calls``.
+    """
+
+    def __init__(self, corpus, latency=0.0, jitter=0.0, flood_rate=0.0, flood_seconds=1, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.calls = Counter()
+        self.sent = []
+        self.forwarded = []
+        self.handlers = []
+        self._rng = random.Random(seed)
+        self._next_channel_id = 1
+        self._entities = {}
+        self._messages = {}
+        self._connected = False
+        self.me = FakeUser(1, 'benchmark')
+        for title, texts in corpus.values():
+            self.add_channel(title, texts)
+
+    def add_channel(self, title, texts=(), megagroup=False):
+        channel_id = 1_000_000 + self._next_channel_id
+        self._next_channel_id += 1
+        entity = Channel(
+            id=channel_id, title=title, photo=ChatPhotoEmpty(), date=None,
+            broadcast=not megagroup, megagroup=megagroup, access_hash=0,
+            username=f"bench{channel_id}"
+        )
+        peer_id = utils.get_peer_id(entity)
+        self._entities[peer_id] = entity
+        self._messages[peer_id] = []
+        self.post(peer_id, texts)
+        return peer_id
+
+    def post(self, peer_id, texts):
+        """Append messages (texts, or (text, file_name, data) tuples) to a channel"""
+        history = self._messages[peer_id]
+        for item in texts:
+            message_id = len(history) + 1
+            if isinstance(item, tuple):
+                text, file_name, data = item
+                document = FakeDocument(peer_id * 100_000 + message_id, file_name, data)
+            else:
+                text, document = item, None
+            history.append(FakeMessage(message_id, peer_id, text, document))
+
+    async def _api(self, name):
+        self.calls[name] += 1
+        delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.flood_rate and self._rng.random() < self.flood_rate:
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+
+    # Connection lifecycle
+
+    async def start(self, *args, **kwargs):
+        self._connected = True
+        return self
+
+    def is_connected(self):
+        return self._connected
+
+    async def disconnect(self):
+        self._connected = False
+
+    async def run_until_disconnected(self):
+        while self._connected:
+            await asyncio.sleep(0.1)
+
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None):
+        self.handlers = [(cb, ev) for cb, ev in self.handlers if cb != callback]
+
+    # API methods
+
+    async def __call__(self, request):
+        await self._api(type(request).__name__)
+        entity = self._entities[self.add_channel(request.title)]
+        return FakeResult([entity])
+
+    async def get_me(self):
+        await self._api('get_me')
+        return self.me
+
+    async def get_entity(self, peer):
+        await self._api('get_entity')
+        return self._entities[utils.get_peer_id(peer)]
+
+    async def get_dialogs(self, limit=None):
+        await self._api('get_dialogs')
+        return [FakeDialog(entity) for entity in self._entities.values()][:limit]
+
+    async def iter_dialogs(self, limit=None):
+        for dialog in await self.get_dialogs(limit):
+            yield dialog
+
+    async def get_messages(self, entity, limit=100, min_id=0, max_id=0, offset_id=0, reverse=False):
+        await self._api('get_messages')
+        history = self._messages.get(entity, [])
+        if reverse:
+            start = max(min_id, offset_id)
+            selected = [m for m in history if m.id > start and (not max_id or m.id < max_id)]
+            return selected[:limit]
+        upper = min(x for x in (max_id, offset_id, len(history) + 1) if x)
+        selected = [m for m in reversed(history) if min_id < m.id < upper]
+        return selected[:limit]
+
+    async def iter_messages(self, entity, limit=100, **kwargs):
+        for message in await self.get_messages(entity, limit=limit, **kwargs):
+            yield message
+
+    def iter_download(self, document, offset=0, request_size=128 * 1024, **kwargs):
+        return FakeDownload(self, document, offset, request_size)
+
+    async def send_message(self, entity, text, **kwargs):
+        await self._api('send_message')
+        self.sent.append((entity, text))
+        return FakeMessage(len(self.sent), entity, text)
+
+    async def forward_messages(self, entity, messages, from_peer=None, **kwargs):
+        await self._api('forward_messages')
+        ids = messages if isinstance(messages, list) else [messages]
+        self.forwarded.append((entity, from_peer, ids))
+        return ids
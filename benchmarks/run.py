@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import config
+from extractor import ConfigExtractor
+from benchmarks.corpus import load_corpus, make_channel_corpus, make_message
+from benchmarks.fake_client import FakeTelegramClient
+
+# Report metrics checked against a --baseline, by direction of regression
+HIGHER_IS_WORSE = ("cold_cycle_seconds", "incremental_cycle_seconds", "api_calls_per_config", "memory_peak_mb")
+LOWER_IS_WORSE = ("extraction_msgs_per_sec",)
+
+
+def bench_extraction(corpus, rounds=3):
+    texts = [text for _, messages in corpus.values() for text in messages if isinstance(text, str)]
+    extractor = ConfigExtractor(config.DEFAULT_SETTINGS["ENABLED_SERVER_TYPES"])
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            extractor.extract(text)
+    elapsed = time.perf_counter() - start
+    return {
+        "extraction_msgs_per_sec": round(len(texts) * rounds / elapsed),
+        "extraction_mb_per_sec": round(sum(map(len, texts)) * rounds / elapsed / 1e6, 2),
+    }
+
+
+async def bench_scan(corpus, args, workdir):
+    # Keep all scanner state inside the scratch directory
+    config.SEEN_INDEX_PATH = os.path.join(workdir, "seen.db")
+    config.STATE_PATH = os.path.join(workdir, "state.json")
+    config.CURSOR_STORE_PATH = os.path.join(workdir, "cursors.json")
+    config.DOCUMENT_CACHE_PATH = os.path.join(workdir, "documents.db")
+    config.JOURNAL_PATH = os.path.join(workdir, "journal.log")
+    config.ARCHIVE_PATH = os.path.join(workdir, "archive.db")
+    from vpn_scanner import VPNScanner
+    from dialog_index import DialogIndex
+    from request_scheduler import RequestScheduler
+    from sharding import Account
+
+    def make_client(seed):
+        return FakeTelegramClient(
+            corpus, latency=args.latency, jitter=args.latency / 2,
+            flood_rate=args.flood_rate, flood_seconds=1, seed=seed
+        )
+
+    client = make_client(0)
+    clients = [client]
+    scanner = VPNScanner(client=client)
+
+    # Extra scanning accounts, each a member of every channel in the corpus
+    for i in range(1, args.accounts):
+        extra = make_client(i)
+        await extra.start()
+        scheduler = RequestScheduler(args.rate / 60, max(1, args.rate // 60))
+        dialogs = DialogIndex(extra, scheduler.call)
+        await dialogs.build()
+        scanner.accounts.add(Account(f"bench{i}", extra, scheduler, dialogs))
+        clients.append(extra)
+
+    scanner.settings.update({
+        "DELAY_BETWEEN_MESSAGES": 0,
+        "DELAY_BETWEEN_CHANNELS": 0,
+        "MAX_MESSAGES_PER_SCAN": args.page_size,
+        "SCAN_CONCURRENCY": args.concurrency,
+        "API_RATE_PER_MINUTE": args.rate,
+        "API_BURST": max(1, args.rate // 60),
+        "BATCH_FLUSH_SECONDS": 1,
+        "LOG_DIGEST_SECONDS": 1,
+        "STATE_MIRROR_ENABLED": False,
+        "PROBE_ENABLED": False,
+    })
+    scanner.apply_settings()
+
+    await client.start()
+    scanner.outbound.start()
+    scanner.batcher.start()
+    await scanner.dialogs.build()
+    scanner.target_group_id = -1
+    scanner.scanning = True
+    channels = await scanner.get_channels_list()
+
+    async def cycle():
+        for c in clients:
+            c.calls.clear()
+        start = time.perf_counter()
+        results = await scanner.scan_batch(channels)
+        await scanner.batcher.flush()
+        calls = sum((c.calls for c in clients), Counter())
+        return time.perf_counter() - start, results, sum(calls.values()), dict(calls)
+
+    tracemalloc.start()
+    cold_seconds, cold_results, cold_calls, cold_by_method = await cycle()
+    _, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Incremental cycle: a few new posts per channel since the cold scan
+    rng = random.Random(99)
+    for channel in channels:
+        new_messages = [make_message(rng) for _ in range(args.new_messages)]
+        for c in clients:
+            c.post(channel["id"], new_messages)
+    incremental_seconds, incremental_results, incremental_calls, _ = await cycle()
+
+    scanner.scanning = False
+    await scanner.batcher.close()
+    await scanner.outbound.close()
+    scanner.seen_index.close()
+    scanner.document_cache.close()
+    scanner.extraction_pool.close()
+    scanner.journal.close()
+    if scanner.archive is not None:
+        scanner.archive.close()
+
+    forwarded = cold_results["total_servers"] + cold_results["total_files"]
+    return {
+        "channels": len(channels),
+        "accounts": len(scanner.accounts),
+        "cold_cycle_seconds": round(cold_seconds, 3),
+        "cold_api_calls": cold_calls,
+        "cold_api_calls_by_method": cold_by_method,
+        "configs_forwarded": forwarded,
+        "api_calls_per_config": round(cold_calls / max(forwarded, 1), 3),
+        "incremental_cycle_seconds": round(incremental_seconds, 3),
+        "incremental_api_calls": incremental_calls,
+        "incremental_configs_forwarded": incremental_results["total_servers"],
+        "flood_waits": scanner.scheduler.stats["flood_waits"],
+        "retries": scanner.scheduler.stats["retries"],
+        "memory_peak_mb": round(memory_peak / 1e6, 2),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """List metrics that regressed by more than tolerance (fraction)"""
+    regressions = []
+    for key in HIGHER_IS_WORSE:
+        if key in baseline and report[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {baseline[key]} -> {report[key]}")
+    for key in LOWER_IS_WORSE:
+        if key in baseline and report[key] < baseline[key] * (1 - tolerance):
+            regressions.append(f"{key}: {baseline[key]} -> {report[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline VPNScanner benchmark with a fake Telegram client")
+    parser.add_argument("--corpus", help="JSON lines corpus to replay (default: synthetic)")
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--new-messages", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8, help="channels scanned in parallel per account")
+    parser.add_argument("--rate", type=int, default=600_000, help="API calls per minute per account")
+    parser.add_argument("--accounts", type=int, default=1, help="scanning accounts sharing the channels")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per fake API call")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="probability of FloodWait per call")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="fail if worse than this earlier --json report")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = make_channel_corpus(args.channels, args.messages)
+
+    report = bench_extraction(corpus)
+    with tempfile.TemporaryDirectory() as workdir:
+        report.update(asyncio.run(bench_scan(corpus, args, workdir)))
+
+    for key, value in report.items():
+        print(f"{key:<28} {value}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import heapq
+import time
+
+
+class ChannelSchedule:
+    """Polling state and recent yield of one channel"""
+
+    __slots__ = (
+        'channel', 'interval', 'next_due', 'last_scan', 'scans',
+        'config_rate', 'message_rate', 'total_configs'
+    )
+
+    def __init__(self, channel, interval, next_due):
+        self.channel = channel
+        self.interval = interval
+        self.next_due = next_due
+        self.last_scan = None
+        self.scans = 0
+        self.config_rate = 0.0  # new configs per hour (EWMA)
+        self.message_rate = 0.0  # new messages per hour (EWMA)
+        self.total_configs = 0
+
+
+class ChannelScheduler:
+    """Priority queue of channels keyed by next-due time
+
+    After every scan a channel's interval is derived from its recent rate
+    of new configs and messages: productive channels are polled often
+    enough to pick up about ``TARGET_CONFIGS`` new configs per scan, busy
+    but unproductive ones about ``TARGET_MESSAGES`` messages per scan, and
+    silent ones back off exponentially. Intervals are clamped to
+    ``[min_interval, max_interval]``.
+    """
+
+    TARGET_CONFIGS = 2
+    TARGET_MESSAGES = 25
+    SMOOTHING = 0.3
+
+    def __init__(self, base_interval, min_interval, max_interval):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._schedules = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self._schedules)
+
+    def _push(self, schedule):
+        heapq.heappush(self._heap, (schedule.next_due, schedule.channel['id']))
+
+    def _clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def sync(self, channels, now=None):
+        """Track new channels (due immediately) and forget removed ones"""
+        now = time.monotonic() if now is None else now
+        current = {channel['id']: channel for channel in channels}
+        for channel_id in list(self._schedules):
+            if channel_id not in current:
+                del self._schedules[channel_id]
+        for channel_id, channel in current.items():
+            schedule = self._schedules.get(channel_id)
+            if schedule is None:
+                schedule = ChannelSchedule(channel, self._clamp(self.base_interval), now)
+                self._schedules[channel_id] = schedule
+                self._push(schedule)
+            else:
+                schedule.channel = channel
+
+    def pop_due(self, now=None):
+        """Remove and return every channel whose next-due time has passed"""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_due, channel_id = heapq.heappop(self._heap)
+            schedule = self._schedules.get(channel_id)
+            # Skip entries for removed channels or superseded due times
+            if schedule is not None and schedule.next_due == next_due:
+                due.append(schedule.channel)
+        return due
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the earliest channel is due (None when idle)"""
+        now = time.monotonic() if now is None else now
+        while self._heap:
+            next_due, channel_id = self._heap[0]
+            schedule = self._schedules.get(channel_id)
+            if schedule is not None and schedule.next_due == next_due:
+                return max(0.0, next_due - now)
+            heapq.heappop(self._heap)
+        return None
+
+    def record(self, channel_id, messages, configs, now=None):
+        """Update a channel's yield after a scan and schedule its next one"""
+        schedule = self._schedules.get(channel_id)
+        if schedule is None:
+            return
+        now = time.monotonic() if now is None else now
+
+        hours = (now - schedule.last_scan) / 3600 if schedule.last_scan else schedule.interval / 3600
+        hours = max(hours, 1 / 3600)
+        alpha = self.SMOOTHING if schedule.scans else 1.0
+        schedule.config_rate += alpha * (configs / hours - schedule.config_rate)
+        schedule.message_rate += alpha * (messages / hours - schedule.message_rate)
+        schedule.last_scan = now
+        schedule.scans += 1
+        schedule.total_configs += configs
+
+        candidates = []
+        if schedule.config_rate > 0:
+            candidates.append(self.TARGET_CONFIGS / schedule.config_rate * 3600)
+        if schedule.message_rate > 0:
+            candidates.append(self.TARGET_MESSAGES / schedule.message_rate * 3600)
+        interval = min(candidates) if candidates else schedule.interval * 2
+
+        schedule.interval = self._clamp(interval)
+        schedule.next_due = now + schedule.interval
+        self._push(schedule)
+
+    def reschedule(self, channel_id, now=None):
+        """Put a channel back on its current interval without new yield data"""
+        schedule = self._schedules.get(channel_id)
+        if schedule is not None:
+            now = time.monotonic() if now is None else now
+            schedule.next_due = now + schedule.interval
+            self._push(schedule)
+
+    def top(self, count=5):
+        """Channels with the highest recent config rate"""
+        ranked = sorted(self._schedules.values(), key=lambda s: s.config_rate, reverse=True)
+        return ranked[:count]
@@ -4,7 +4,29 @@ API_HASH = "92c68d49f5d47362c8a73ef3cb769bc7"
 PHONE_NUMBER = "+989224053123"
 
 # Session settings
-SESSION_NAME = "vpn_scanner"
+SESSION_NAME = "vpn_scanner"  # Controller account: commands, forwarding and logs
+
+# Extra accounts that share the channel scanning, e.g.
+# {"session": "vpn_scanner_2", "phone": "+98...", "api_id": 123, "api_hash": "..."}
+# (api_id/api_hash default to the ones above). Each account only scans
+# channels it has joined.
+ACCOUNTS = []
+
+# Local storage
+SEEN_INDEX_PATH = "vpn_scanner_seen.db"
+STATE_PATH = "vpn_scanner_state.json"
+DOCUMENT_CACHE_PATH = "vpn_scanner_documents.db"
+JOURNAL_PATH = "vpn_scanner_journal.log"  # Write-ahead log of unsent items and scan progress
+ARCHIVE_PATH = "vpn_scanner_archive.db"  # Every extracted config, for vpn:search and vpn:export
+SINK_DIR = "subscriptions"  # Append-only per-type config logs
+CURSOR_STORE_PATH = "vpn_scanner_cursors.json"  # Legacy, imported into STATE_PATH once
+
+# Attachment content scanning (request size must be a multiple of 4096, at most 512 KB)
+FILE_SCAN_CHUNK_SIZE = 128 * 1024
+
+# Local HTTP endpoints
+METRICS_HOST = "127.0.0.1"
+SINK_HOST = "127.0.0.1"  # Subscription server; put a reverse proxy in front to expose it
 
 # Default scanner settings
 DEFAULT_SETTINGS = {
@@ -15,7 +37,51 @@ DEFAULT_SETTINGS = {
     "ENABLED_SERVER_TYPES": ["vmess", "vless", "ss", "trojan", "wireguard", "outline"],
     "ENABLED_FILE_EXTENSIONS": [".bak", ".txt", ".npvt", ".ovpn", ".ehi", ".apk", ".conf"],
     "FILE_FORWARDING_ENABLED": True,
-    "REAL_TIME_MODE": True  # New setting for real-time processing
+    "FILE_CONTENT_SCAN": False,  # Stream matching attachments and extract the configs inside
+    "FILE_SCAN_EXTENSIONS": [".txt", ".conf"],
+    "FILE_SCAN_MAX_BYTES": 8000000,  # Larger attachments are not downloaded
+    "REAL_TIME_MODE": True,  # New setting for real-time processing
+    "ADAPTIVE_SCHEDULING": True,  # Poll each channel on an interval derived from its yield
+    "MIN_CHANNEL_INTERVAL": 60,
+    "MAX_CHANNEL_INTERVAL": 21600,
+    "RECONCILE_INTERVAL": 900,  # Polling sweep interval while real-time mode is active
+    "SEEN_TTL_HOURS": 168,  # Re-forward a config after this long (0 = never)
+    "SCAN_CONCURRENCY": 1,  # Channels scanned in parallel (1 = sequential with fixed delays)
+    "API_RATE_PER_MINUTE": 60,  # Shared budget for fetch/send/forward calls
+    "API_BURST": 10,
+    "API_MAX_RETRIES": 5,  # Retries per call on FloodWait or transient errors
+    "MAX_FLOOD_WAIT": 600,  # Give up instead of waiting out longer FloodWaits
+    "ACCOUNT_FAILOVER_WAIT": 60,  # Hand a scanning account's channels to others during longer FloodWaits
+    "BATCH_MAX_ITEMS": 20,  # Configs/files coalesced before a batch is sent
+    "BATCH_FLUSH_SECONDS": 5,  # Send a partial batch after this long
+    "JOURNAL_FLUSH_SECONDS": 1,  # Journal records are appended in batches this often
+    "JOURNAL_FSYNC_SECONDS": 5,  # fsync the journal at most this often (0 = every append batch)
+    "LOG_DIGEST_SECONDS": 10,  # Log lines within this window share one message
+    "LOG_TO_SAVED_MESSAGES": True,  # Mirror log digests to Saved Messages
+    "STATE_MIRROR_ENABLED": True,  # Mirror settings/target group to Saved Messages in the background
+    "DIALOG_REFRESH_INTERVAL": 3600,  # Full dialog re-enumeration; joins/leaves are tracked live
+    "EXPAND_SUBSCRIPTIONS": True,  # Decode base64 subscription blobs and extract the configs inside
+    "EXTRACTION_WORKERS": 0,  # Processes for large texts (0 = one per CPU core)
+    "EXTRACTION_THRESHOLD": 65536,  # Texts at least this many characters go to a worker
+    "EXTRACTION_TIMEOUT": 30,  # Seconds before a worker job is abandoned
+    "PROBE_ENABLED": False,  # Only forward servers that accept a TCP/TLS connection
+    "PROBE_CONCURRENCY": 200,
+    "PROBE_TIMEOUT": 5,
+    "PROBE_CACHE_TTL": 600,  # Seconds a probe result is reused per host
+    "METRICS_ENABLED": False,  # Serve Prometheus metrics on METRICS_HOST:METRICS_PORT
+    "METRICS_PORT": 9464,
+    "SINK_ENABLED": False,  # Append configs to local logs served as base64 subscriptions
+    "SINK_ONLY": False,  # Skip forwarding configs to the target group (files are still forwarded)
+    "SINK_PORT": 8080,  # Serves /sub and /sub/<type> on SINK_HOST
+    "SINK_TTL_HOURS": 72,  # Drop configs from the subscriptions after this long (0 = never)
+    "SINK_COMPACT_INTERVAL": 3600,
+    "BACKFILL_MESSAGES_PER_MINUTE": 3000,  # Throughput target for vpn:backfill
+    "BACKFILL_CHUNK_SIZE": 500,  # Messages per history page (Telegram serves 100 per request)
+    "BACKFILL_MAX_MESSAGES": 0,  # History depth per channel (0 = back to the first message)
+    "ARCHIVE_ENABLED": True,  # Keep every extracted config in a local searchable archive
+    "ARCHIVE_RETENTION_DAYS": 30,  # Drop configs not seen for this long (0 = never)
+    "ARCHIVE_MAX_ROWS": 5000000,  # Then drop the least recently seen beyond this (0 = unlimited)
+    "ARCHIVE_EXPORT_LIMIT": 100000  # Rows per vpn:export file
 }
 
 # VPN server patterns (fixed regex patterns)
@@ -37,7 +103,7 @@ VPN_PATTERNS = {
         r"trojan://[^\s]+",
     ],
     "wireguard": [
-        r"\[Interface\][\s\S]*?\[Peer\][\s\S]*?",
+        r"\[Interface\][\s\S]*?\[Peer\](?:[ \t]*\r?\n[ \t]*[A-Za-z]+[ \t]*=[^\r\n]*)*",
         r"wg://[^\s]+",
     ],
     "outline": [
@@ -56,6 +122,7 @@ COMMANDS = {
     "start": "vpn:start",
     "stop": "vpn:stop",
     "status": "vpn:status",
+    "stats": "vpn:stats",
     "settings": "vpn:settings",
     "groups": "vpn:groups",
     "set_target": "vpn:set_target",
@@ -64,6 +131,9 @@ COMMANDS = {
     "enable_server": "vpn:enable_server",
     "disable_server": "vpn:disable_server",
     "restart": "vpn:restart",
+    "backfill": "vpn:backfill",
+    "search": "vpn:search",
+    "export": "vpn:export",
     "toggle_realtime": "vpn:toggle_realtime"  # New command
 }
 
@@ -0,0 +1,234 @@
+import base64
+import binascii
+import hashlib
+import json
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# Query/JSON fields that only label a server and never change where it points
+COSMETIC_FIELDS = {'ps', 'remark', 'remarks', 'name', 'v', 'tag'}
+
+# Schemes that speak the same protocol share one fingerprint namespace
+PROTOCOL_FAMILIES = {'shadowsocks': 'ss', 'outline': 'ss'}
+
+
+class ParsedConfig:
+    """Structured view of one extracted config"""
+
+    __slots__ = (
+        'type', 'host', 'port', 'credential', 'transport', 'security',
+        'params', 'remark', 'fingerprint'
+    )
+
+    def __init__(self, server_type, host, port, credential='', transport='tcp',
+                 security='', params=None, remark=''):
+        self.type = server_type
+        self.host = (host or '').lower()
+        self.port = port
+        self.credential = credential or ''
+        self.transport = (transport or 'tcp').lower()
+        self.security = (security or '').lower()
+        self.params = params or {}
+        self.remark = remark or ''
+        self.fingerprint = self._fingerprint()
+
+    def _fingerprint(self):
+        family = PROTOCOL_FAMILIES.get(self.type, self.type)
+        extra = '&'.join(f"{k}={v}" for k, v in sorted(self.params.items()))
+        canonical = '|'.join((
+            family, self.host, str(self.port or ''), self.credential,
+            self.transport, self.security, extra
+        ))
+        return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+    def __repr__(self):
+        return f"<ParsedConfig {self.type} {self.host}:{self.port} {self.transport}/{self.security or 'none'}>"
+
+
+def _b64decode(data):
+    """Decode standard or URL-safe base64 with or without padding"""
+    data = data.strip().replace('-', '+').replace('_', '/')
+    return base64.b64decode(data + '=' * (-len(data) % 4), validate=True)
+
+
+def _port(value):
+    try:
+        port = int(value)
+    except (TypeError, ValueError):
+        return None
+    return port if 0 < port < 65536 else None
+
+
+def _clean_params(pairs):
+    return {k.lower(): v for k, v in pairs if v != '' and k.lower() not in COSMETIC_FIELDS}
+
+
+def _split_uri(raw):
+    """urlsplit that tolerates ports urllib refuses to parse"""
+    parts = urlsplit(raw)
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    return parts, port
+
+
+def parse_vmess(raw, server_type='vmess'):
+    payload = raw.split('://', 1)[1].split('#', 1)[0]
+    try:
+        data = json.loads(_b64decode(payload))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        # Some clients share vmess in the vless-style URI form
+        return parse_uri(raw, server_type)
+    if not isinstance(data, dict):
+        return None
+
+    params = _clean_params(
+        (str(k), str(v)) for k, v in data.items()
+        if k not in ('add', 'port', 'id', 'net', 'tls')
+    )
+    return ParsedConfig(
+        server_type,
+        str(data.get('add', '')),
+        _port(data.get('port')),
+        credential=str(data.get('id', '')),
+        transport=str(data.get('net') or 'tcp'),
+        security=str(data.get('tls') or ''),
+        params=params,
+        remark=str(data.get('ps', ''))
+    )
+
+
+def parse_uri(raw, server_type):
+    """vless/trojan style: scheme://credential@host:port?query#remark"""
+    parts, port = _split_uri(raw)
+    if not parts.hostname:
+        return None
+    query = dict(parse_qsl(parts.query))
+    transport = query.pop('type', None) or query.pop('transport', None) or 'tcp'
+    default_security = 'tls' if server_type == 'trojan' else ''
+    security = query.pop('security', None) or default_security
+    return ParsedConfig(
+        server_type,
+        parts.hostname,
+        port,
+        credential=unquote(parts.username or ''),
+        transport=transport,
+        security=security,
+        params=_clean_params(query.items()),
+        remark=unquote(parts.fragment)
+    )
+
+
+def parse_ss(raw, server_type='ss'):
+    """SIP002 (ss://b64(method:pass)@host:port) and legacy (ss://b64(all)) forms"""
+    body, _, remark = raw.split('://', 1)[1].partition('#')
+    if '@' not in body:
+        try:
+            body = _b64decode(body.split('?', 1)[0]).decode('utf-8')
+        except (binascii.Error, ValueError, UnicodeDecodeError):
+            return None
+        if '@' not in body:
+            return None
+
+    userinfo, _, hostinfo = body.rpartition('@')
+    userinfo = unquote(userinfo)
+    if ':' not in userinfo:
+        try:
+            userinfo = _b64decode(userinfo).decode('utf-8')
+        except (binascii.Error, ValueError, UnicodeDecodeError):
+            return None
+    method, _, password = userinfo.partition(':')
+
+    parts, port = _split_uri(f"ss://{hostinfo}")
+    if not parts.hostname:
+        return None
+    return ParsedConfig(
+        server_type,
+        parts.hostname,
+        port,
+        credential=f"{method.lower()}:{password}",
+        transport='tcp',
+        params=_clean_params(parse_qsl(parts.query)),
+        remark=unquote(remark)
+    )
+
+
+def parse_wireguard(raw, server_type='wireguard'):
+    """[Interface]/[Peer] INI blocks, or wg:// URIs"""
+    if '://' in raw:
+        parts, port = _split_uri(raw)
+        if not parts.hostname:
+            return None
+        query = dict(parse_qsl(parts.query))
+        return ParsedConfig(
+            server_type,
+            parts.hostname,
+            port,
+            credential=query.pop('publickey', '') or unquote(parts.username or ''),
+            transport='udp',
+            params=_clean_params(query.items()),
+            remark=unquote(parts.fragment)
+        )
+
+    sections = {}
+    current = None
+    for line in raw.splitlines():
+        line = line.strip()
+        if line.startswith('[') and line.endswith(']'):
+            current = sections.setdefault(line[1:-1].lower(), {})
+        elif current is not None and '=' in line:
+            key, value = line.split('=', 1)
+            current[key.strip().lower()] = value.strip()
+
+    interface = sections.get('interface', {})
+    peer = sections.get('peer', {})
+    host, _, port = peer.get('endpoint', '').rpartition(':')
+    return ParsedConfig(
+        server_type,
+        host.strip('[]'),
+        _port(port),
+        credential=peer.get('publickey', '') or interface.get('privatekey', ''),
+        transport='udp',
+        params=_clean_params(
+            (k, interface[k]) for k in ('address', 'privatekey') if k in interface
+        )
+    )
+
+
+def parse_proxy(raw, server_type='proxy_links'):
+    """MTProto proxy links: t.me/proxy?server=...&port=...&secret=..."""
+    query = dict(parse_qsl(urlsplit(raw).query))
+    if not query.get('server'):
+        return None
+    return ParsedConfig(
+        server_type,
+        query.pop('server'),
+        _port(query.pop('port', None)),
+        credential=query.pop('secret', ''),
+        transport='mtproto',
+        params=_clean_params(query.items())
+    )
+
+
+PARSERS = {
+    'vmess': parse_vmess,
+    'vless': parse_uri,
+    'trojan': parse_uri,
+    'ss': parse_ss,
+    'outline': parse_ss,
+    'wireguard': parse_wireguard,
+    'proxy_links': parse_proxy,
+}
+
+
+def parse_config(server_type, raw):
+    """Parse an extracted config, returns a ParsedConfig or None"""
+    parser = PARSERS.get(server_type)
+    if parser is None:
+        return None
+    if server_type in ('ss', 'outline') and raw.lower().startswith('outline://'):
+        parser = parse_uri
+    try:
+        return parser(raw, server_type)
+    except (ValueError, UnicodeError):
+        return None
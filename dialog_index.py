@@ -0,0 +1,144 @@
+import asyncio
+from telethon import events, utils
+from telethon.tl.types import Channel, Chat, PeerChannel, UpdateChannel
+
+
+class DialogIndex:
+    """In-memory index of the account's channels and groups
+
+    Built once from ``get_dialogs`` and then kept current from join/leave
+    updates (``UpdateChannel`` and ``ChatAction`` events), with a full
+    re-enumeration only every ``refresh_interval`` seconds as a safety net.
+    ``version`` increases on every membership change and ``on_change`` is
+    called so subscribers can react without polling.
+    """
+
+    def __init__(self, client, call_api, refresh_interval=3600, on_change=None, metrics=None):
+        self.client = client
+        self.call_api = call_api
+        self.refresh_interval = refresh_interval
+        self.on_change = on_change
+        self.metrics = metrics
+        self.version = 0
+        self.me_id = None
+        self._entries = {}
+        self._refresh_task = None
+
+    @staticmethod
+    def _entry(entity):
+        is_broadcast = isinstance(entity, Channel) and entity.broadcast
+        return {
+            'id': utils.get_peer_id(entity),
+            'title': utils.get_display_name(entity),
+            'username': getattr(entity, 'username', None) or 'No username',
+            'is_channel': is_broadcast,
+            'is_group': isinstance(entity, Chat) or (isinstance(entity, Channel) and entity.megagroup),
+            'participants': getattr(entity, 'participants_count', None) or 'Unknown'
+        }
+
+    def __contains__(self, peer_id):
+        return peer_id in self._entries
+
+    def _changed(self):
+        self.version += 1
+        if self.on_change is not None:
+            asyncio.ensure_future(self.on_change())
+
+    async def build(self):
+        """Enumerate all dialogs and replace the index"""
+        if self.me_id is None:
+            self.me_id = (await self.call_api(self.client.get_me)).id
+        if self.metrics is None:
+            dialogs = await self.call_api(self.client.get_dialogs)
+        else:
+            with self.metrics.time('dialog_fetch'):
+                dialogs = await self.call_api(self.client.get_dialogs)
+        entries = {}
+        for dialog in dialogs:
+            if dialog.is_channel or dialog.is_group:
+                entry = self._entry(dialog.entity)
+                entries[entry['id']] = entry
+        if entries.keys() != self._entries.keys():
+            self._entries = entries
+            self._changed()
+        else:
+            self._entries = entries
+
+    def add(self, entity):
+        entry = self._entry(entity)
+        if not (entry['is_channel'] or entry['is_group']):
+            return
+        is_new = entry['id'] not in self._entries
+        self._entries[entry['id']] = entry
+        if is_new:
+            self._changed()
+
+    def remove(self, peer_id):
+        if self._entries.pop(peer_id, None) is not None:
+            self._changed()
+
+    def channels(self):
+        """Broadcast channels the account has joined"""
+        return [
+            {'id': e['id'], 'title': e['title'], 'username': e['username']}
+            for e in self._entries.values() if e['is_channel']
+        ]
+
+    def groups(self):
+        """Groups the account has joined"""
+        return [
+            {'id': e['id'], 'title': e['title'], 'participants': e['participants']}
+            for e in self._entries.values() if e['is_group']
+        ]
+
+    def find(self, title, is_channel=True):
+        """Id of the first dialog with this title, or None"""
+        for entry in self._entries.values():
+            if entry['title'] == title and entry['is_channel'] == is_channel:
+                return entry['id']
+        return None
+
+    async def handle_channel_update(self, update):
+        """Join/leave of a channel or supergroup"""
+        try:
+            entity = await self.call_api(self.client.get_entity, PeerChannel(update.channel_id))
+        except Exception:
+            # No longer accessible: treat as left
+            self.remove(utils.get_peer_id(PeerChannel(update.channel_id)))
+            return
+        if getattr(entity, 'left', False):
+            self.remove(utils.get_peer_id(entity))
+        else:
+            self.add(entity)
+
+    async def handle_chat_action(self, event):
+        """Join/leave of a basic group (or a megagroup service message)"""
+        if self.me_id is None or self.me_id not in (event.user_ids or []):
+            return
+        if event.user_joined or event.user_added:
+            self.add(await event.get_chat())
+        elif event.user_left or event.user_kicked:
+            self.remove(event.chat_id)
+
+    def register(self):
+        """Attach the incremental update handlers to the client"""
+        self.client.add_event_handler(self.handle_channel_update, events.Raw(UpdateChannel))
+        self.client.add_event_handler(self.handle_chat_action, events.ChatAction())
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.build()
+            except Exception as e:
+                print(f"❌ Error refreshing dialogs: {e}")
+
+    def start(self):
+        """Start the periodic background refresh"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
@@ -0,0 +1,159 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from extractor import ConfigExtractor
+from subscription import SubscriptionExpander
+
+# Per-worker extractor and expander, built once by the pool initializer
+_worker_extractor = None
+_worker_expander = None
+
+
+def _init_worker(server_types):
+    global _worker_extractor, _worker_expander
+    _worker_extractor = ConfigExtractor(server_types)
+    _worker_expander = SubscriptionExpander(_worker_extractor)
+
+
+def _scan(extractor, expander, text, expand):
+    """Hits in text, plus configs decoded from its subscription blobs"""
+    hits = list(extractor.finditer(text))
+    return hits, expander.expand(text) if expand else []
+
+
+def _scan_batch(jobs):
+    return [_scan(_worker_extractor, _worker_expander, text, expand) for text, expand in jobs]
+
+
+class ExtractionPool:
+    """Runs extraction on large texts in worker processes
+
+    Texts shorter than ``threshold`` characters are scanned inline, where
+    pickling would cost more than the scan. Larger ones are queued and
+    submitted together on the next loop iteration, split into roughly one
+    job per worker (at most ``BATCH_CHARS`` each) so a burst uses every
+    core. Each worker compiles the patterns once at startup. A job that
+    runs past ``timeout`` yields no hits and its workers are killed, so one
+    pathological input cannot stall later scans; jobs lost with them are
+    retried once on the new pool, never scanned inline. With ``expand`` set,
+    base64 subscription blobs are decoded and scanned in the same job.
+    """
+
+    BATCH_CHARS = 4 * 1024 * 1024
+
+    def __init__(self, server_types, workers=0, threshold=65536, timeout=30, expand=True):
+        self.server_types = list(server_types)
+        self.extractor = ConfigExtractor(self.server_types)
+        self.expander = SubscriptionExpander(self.extractor)
+        self.workers = workers
+        self.threshold = threshold
+        self.timeout = timeout
+        self.expand = expand
+        self._executor = None
+        self._pending = []
+        self._flush_scheduled = False
+
+    def configure(self, server_types, workers, threshold, timeout, expand):
+        """Apply new settings, restarting the workers if their patterns changed"""
+        server_types = list(server_types)
+        if server_types != self.server_types or workers != self.workers:
+            self.server_types = server_types
+            self.extractor = ConfigExtractor(server_types)
+            self.expander = SubscriptionExpander(self.extractor)
+            self.workers = workers
+            self._shutdown()
+        self.threshold = threshold
+        self.timeout = timeout
+        self.expand = expand
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers or os.cpu_count(),
+                # Spawned workers do not inherit the client's threads and sockets
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.server_types,)
+            )
+        return self._executor
+
+    def _shutdown(self, terminate=False):
+        if self._executor is not None:
+            # shutdown() leaves a running job's worker busy, so a stuck one is killed
+            processes = list((self._executor._processes or {}).values()) if terminate else []
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+            self._executor = None
+
+    async def scan(self, text, expand=False):
+        """(hits, expanded configs) for text, from a worker for large texts"""
+        if len(text) < self.threshold:
+            return _scan(self.extractor, self.expander, text, expand)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, expand, future))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+        return await future
+
+    async def finditer(self, text):
+        """(server_type, start, end) hits in text"""
+        hits, _ = await self.scan(text)
+        return hits
+
+    async def extract(self, text):
+        """Extract tagged VPN configurations from text and its subscription blobs"""
+        hits, expanded = await self.scan(text, self.expand)
+        found = [
+            {'type': server_type, 'config': text[start:end].strip()}
+            for server_type, start, end in hits
+        ]
+        return found + expanded
+
+    def _flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        # Spread a burst over all workers, but keep each job reasonably large
+        total = sum(len(item[0]) for item in pending)
+        job_chars = min(self.BATCH_CHARS, max(self.threshold, total // (self.workers or os.cpu_count())))
+        batch, size = [], 0
+        for item in pending:
+            if batch and size + len(item[0]) > job_chars:
+                asyncio.ensure_future(self._run(batch))
+                batch, size = [], 0
+            batch.append(item)
+            size += len(item[0])
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch, retry=True):
+        jobs = [(text, expand) for text, expand, _ in batch]
+        executor = self._pool()
+        try:
+            job = asyncio.wrap_future(executor.submit(_scan_batch, jobs))
+            results = await asyncio.wait_for(job, self.timeout)
+        except asyncio.TimeoutError:
+            chars = sum(len(text) for text, _ in jobs)
+            print(f"⚠️ Extraction job over {self.timeout}s ({chars} chars), restarting workers")
+            if executor is self._executor:
+                self._shutdown(terminate=True)
+            results = [([], []) for _ in jobs]
+        except Exception as e:
+            if executor is self._executor:
+                # Broken pool (e.g. a killed worker), not one replaced after a timeout
+                print(f"⚠️ Extraction worker failed: {e}")
+                self._shutdown()
+            if retry:
+                # Jobs lost with their pool get one more try on a fresh one
+                return await self._run(batch, retry=False)
+            # Never inline: a text this large would stall the event loop
+            results = [([], []) for _ in jobs]
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def close(self):
+        self._shutdown(terminate=True)
@@ -0,0 +1,105 @@
+import re
+import config
+
+_META = set('.^$*+?{}[]()|\\')
+_QUANTIFIERS = set('*+?{')
+
+
+def _literal_prefix(pattern):
+    """Return the leading literal text of a regex, or '' if it has none"""
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal, step = pattern[i + 1], 2
+        elif char not in _META:
+            literal, step = char, 1
+        else:
+            break
+        if i + step < len(pattern) and pattern[i + step] in _QUANTIFIERS:
+            break
+        prefix.append(literal)
+        i += step
+    return ''.join(prefix)
+
+
+class ConfigExtractor:
+    """Single-pass scanner over the enabled VPN_PATTERNS
+
+    The patterns of the enabled server types are reduced to their literal
+    prefixes (``vmess://``, ``[interface]``, ...) and folded into one
+    case-sensitive locator that runs over the lowercased message. At every
+    hit the full patterns are tried anchored at that position and the
+    longest one wins, so overlapping patterns (``vmess://[A-Za-z0-9+/=]+``
+    vs ``vmess://[^\\s]+``, ``ss://`` vs ``outline``, ``ss://`` inside
+    ``vless://``) collapse into a single tagged hit. Patterns without a
+    literal prefix fall back to a full case-insensitive alternation.
+    """
+
+    FLAGS = re.IGNORECASE | re.MULTILINE
+
+    def __init__(self, server_types, patterns=None):
+        patterns = config.VPN_PATTERNS if patterns is None else patterns
+        self.server_types = [t for t in server_types if t in patterns]
+        self._patterns = []
+        for server_type in self.server_types:
+            for pattern in patterns[server_type]:
+                self._patterns.append((server_type, re.compile(pattern, self.FLAGS)))
+
+        self._locator = None
+        self._prefix_locator = None
+        if not self._patterns:
+            return
+
+        prefixes = [_literal_prefix(p.pattern).lower() for _, p in self._patterns]
+        if all(prefixes):
+            # Longest first so the alternation never stops at a shorter prefix
+            ordered = sorted(set(prefixes), key=len, reverse=True)
+            self._prefix_locator = re.compile('|'.join(map(re.escape, ordered)))
+
+        self._locator = re.compile(
+            '|'.join(f'(?:{p.pattern})' for _, p in self._patterns),
+            self.FLAGS
+        )
+
+    def finditer(self, text, pos=0, endpos=None):
+        """Yield (server_type, start, end) for every non-overlapping hit"""
+        if self._locator is None:
+            return
+        if endpos is None:
+            endpos = len(text)
+
+        search, haystack = self._locator.search, text
+        if self._prefix_locator is not None:
+            lowered = text.lower()
+            # lower() only ever expands characters, so equal length keeps offsets aligned
+            if len(lowered) == len(text):
+                search, haystack = self._prefix_locator.search, lowered
+
+        while pos < endpos:
+            hit = search(haystack, pos, endpos)
+            if not hit:
+                return
+
+            start = hit.start()
+            best_type, best_end = None, start
+            for server_type, pattern in self._patterns:
+                m = pattern.match(text, start, endpos)
+                if m and m.end() > best_end:
+                    best_type, best_end = server_type, m.end()
+
+            if best_type is None:
+                # Prefix seen but no full pattern matched here
+                pos = start + 1
+                continue
+
+            yield best_type, start, best_end
+            pos = best_end
+
+    def extract(self, text):
+        """Extract tagged VPN configurations from text"""
+        return [
+            {'type': server_type, 'config': text[start:end].strip()}
+            for server_type, start, end in self.finditer(text)
+        ]
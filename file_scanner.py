@@ -0,0 +1,92 @@
+import codecs
+import sqlite3
+import time
+
+
+class StreamExtractor:
+    """Run a ConfigExtractor over a byte stream in constant memory
+
+    Chunks are decoded incrementally and scanned together with the carried
+    tail of the previous chunk. A hit is only reported once at least
+    ``OVERLAP`` characters follow it, so a config cut by a chunk boundary
+    (or a WireGuard block whose trailing ``key = value`` lines are still
+    arriving) is rescanned whole with the next chunk, and a prefix split
+    across chunks (``vme`` + ``ss://``) is still seen. A single unfinished
+    hit longer than ``MAX_CARRY`` is dropped.
+    """
+
+    OVERLAP = 8192
+    MAX_CARRY = 1 << 20
+
+    def __init__(self, extractor, encoding='utf-8'):
+        self.extractor = extractor
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._buffer = ''
+
+    def feed(self, data, final=False):
+        """Decode a chunk and return the configs completed so far"""
+        text = self.decode(data, final)
+        return self.settle(text, self.extractor.finditer(text), final)
+
+    def decode(self, data, final=False):
+        """Carried tail plus the decoded chunk: the text to scan next"""
+        return self._buffer + self._decoder.decode(data, final)
+
+    def settle(self, text, hits, final=False):
+        """Return the configs among ``hits`` that can no longer grow and carry the rest"""
+        endpos = len(text)
+        settled = endpos if final else endpos - self.OVERLAP
+        carry_from = max(0, settled)
+        emitted_end = 0
+        found = []
+        for server_type, start, end in hits:
+            if end > settled:
+                # Could still grow with the next chunk
+                carry_from = min(carry_from, start)
+                break
+            found.append({'type': server_type, 'config': text[start:end].strip()})
+            emitted_end = end
+
+        self._buffer = text[max(carry_from, emitted_end):]
+        if len(self._buffer) > self.MAX_CARRY:
+            self._buffer = self._buffer[-self.OVERLAP:]
+        return found
+
+    def close(self):
+        """Flush the decoder and return whatever is left in the carry"""
+        return self.feed(b'', final=True)
+
+
+class DocumentCache:
+    """SQLite record of documents whose contents were already scanned
+
+    Telegram keeps the document id when a file is forwarded or reposted, so
+    a hit means the file's configs already went through the seen index and
+    it does not need to be downloaded again.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            'doc_id INTEGER PRIMARY KEY, scanned_at REAL NOT NULL, '
+            'size INTEGER NOT NULL, configs INTEGER NOT NULL)'
+        )
+        self._db.commit()
+
+    def contains(self, doc_id):
+        row = self._db.execute('SELECT 1 FROM documents WHERE doc_id = ?', (doc_id,)).fetchone()
+        return row is not None
+
+    def add(self, doc_id, size, configs):
+        """Record a scanned document and how many configs it held"""
+        self._db.execute(
+            'INSERT OR REPLACE INTO documents (doc_id, scanned_at, size, configs) VALUES (?, ?, ?, ?)',
+            (doc_id, time.time(), size, configs)
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,79 @@
+import asyncio
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class HTTPServer:
+    """Minimal asyncio HTTP/1.1 server for small local GET endpoints
+
+    ``routes`` maps a path to ``async handler(headers) -> (status, headers,
+    body)``, where request headers arrive lower-cased and ``body`` is
+    bytes. One request per connection; anything but GET/HEAD is rejected.
+    """
+
+    MAX_HEADER_BYTES = 16384
+
+    def __init__(self, routes, host='127.0.0.1', port=0):
+        self.routes = routes
+        self.host = host
+        self.port = port
+        self._task = None
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+            if len(head) > self.MAX_HEADER_BYTES:
+                raise ValueError('headers too large')
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, _ = request_line.split(' ', 2)
+            headers = {}
+            for line in header_lines:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            handler = self.routes.get(target.split('?', 1)[0])
+            if method not in ('GET', 'HEAD'):
+                status, response_headers, body = 405, {}, b''
+            elif handler is None:
+                status, response_headers, body = 404, {}, b''
+            else:
+                status, response_headers, body = await handler(headers)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+            status, response_headers, body, method = 400, {}, b'', 'GET'
+        except Exception as e:
+            print(f"❌ HTTP handler error: {e}")
+            writer.close()
+            return
+
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in response_headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if method != 'HEAD':
+            writer.write(body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    def start(self):
+        """Start listening in the background"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._serve())
+            self._task.add_done_callback(self._report_failure)
+
+    def _report_failure(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"❌ HTTP server on {self.host}:{self.port} failed: {task.exception()}")
+            self._task = None
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
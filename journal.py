@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+class Journal:
+    """Write-ahead log of found-but-unsent items and per-channel progress
+
+    Records are JSON lines buffered in memory and appended in batches: on
+    ``max_batch`` buffered records or ``flush_interval`` seconds after the
+    first one, whichever comes first. The file is fsynced at most every
+    ``fsync_interval`` seconds (0 = on every flush), so a process crash
+    loses at most one flush interval of records and a power loss at most
+    one fsync interval.
+
+    ``replay`` rebuilds the unsent items, the latest cursor per channel and
+    the last stats snapshot; ``compact`` rewrites the file with only the
+    unsent items once cursors and stats are safely in the state store.
+    """
+
+    def __init__(self, path, flush_interval=1, fsync_interval=5, max_batch=256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self._pending = {}
+        self._buffer = []
+        self._timer = None
+        self._last_fsync = time.monotonic()
+        self._file = open(path, 'a', encoding='utf-8')
+        # Start on a fresh line after a torn final record
+        if self._file.tell():
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write('\n')
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _append(self, record):
+        self._buffer.append(json.dumps(record, ensure_ascii=False))
+        if len(self._buffer) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            try:
+                self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+            except RuntimeError:
+                # No loop (shutdown path): write through
+                self.flush()
+
+    def found(self, key, item):
+        """Record an item queued for sending"""
+        self._pending[key] = item
+        self._append({'op': 'found', 'key': key, 'item': item})
+
+    def settled(self, keys):
+        """Record items that left the send queue (sent or dropped); failed ones stay pending"""
+        keys = [key for key in keys if self._pending.pop(key, None) is not None]
+        if keys:
+            self._append({'op': 'settled', 'keys': keys})
+
+    def progress(self, channel_id, message_id, stats):
+        """Record a channel's new cursor with a snapshot of the scan counters"""
+        self._append({'op': 'progress', 'channel': channel_id, 'msg': message_id, 'stats': stats})
+
+    def flush(self):
+        """Append buffered records, fsyncing per the policy"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        self._file.write('\n'.join(self._buffer) + '\n')
+        self._buffer.clear()
+        self._file.flush()
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def replay(self):
+        """Read the journal back: (unsent items by key, cursors by channel, last stats)"""
+        self.flush()
+        pending, cursors, stats = {}, {}, None
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write at the crash point
+                    continue
+                op = record.get('op')
+                if op == 'found':
+                    pending[record['key']] = record['item']
+                elif op == 'settled':
+                    for key in record['keys']:
+                        pending.pop(key, None)
+                elif op == 'progress':
+                    channel_id = record['channel']
+                    cursors[channel_id] = max(cursors.get(channel_id, 0), record['msg'])
+                    stats = record['stats']
+        self._pending = pending
+        return dict(pending), cursors, stats
+
+    def compact(self):
+        """Rewrite the journal with only the unsent items"""
+        self._buffer.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._file.close()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.journal-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for key, item in self._pending.items():
+                f.write(json.dumps({'op': 'found', 'key': key, 'item': item}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._last_fsync = time.monotonic()
+
+    def close(self):
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
@@ -0,0 +1,129 @@
+import bisect
+import time
+
+# Upper bounds in seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (count, sum and per-bucket counts)"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q):
+        """Estimate the q-th quantile (0..1) by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else lower
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+
+class Timer:
+    """Context manager that records its elapsed time into a Metrics stage"""
+
+    __slots__ = ('metrics', 'stage', 'channel', 'started')
+
+    def __init__(self, metrics, stage, channel):
+        self.metrics = metrics
+        self.stage = stage
+        self.channel = channel
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started, self.channel)
+
+
+class Metrics:
+    """Per-stage timing histograms, optionally broken down by channel
+
+    Every observation lands in the stage histogram; observations made with
+    a channel also land in that channel's histogram for the stage, so the
+    exposition has an aggregate family and a per-channel family that can
+    be summed independently.
+    """
+
+    PREFIX = 'vpn_scanner'
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.stages = {}
+        self.channel_stages = {}
+
+    def observe(self, stage, seconds, channel=None):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(self.bounds)
+        histogram.observe(seconds)
+        if channel is not None:
+            key = (stage, channel)
+            histogram = self.channel_stages.get(key)
+            if histogram is None:
+                histogram = self.channel_stages[key] = Histogram(self.bounds)
+            histogram.observe(seconds)
+
+    def time(self, stage, channel=None):
+        """``with metrics.time('extract', channel_id): ...``"""
+        return Timer(self, stage, channel)
+
+    def slowest_channels(self, count=5):
+        """Channels with the most total time across all stages"""
+        totals = {}
+        for (_, channel), histogram in self.channel_stages.items():
+            totals[channel] = totals.get(channel, 0.0) + histogram.sum
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def _render_histogram(self, lines, name, labels, histogram):
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds, histogram.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    def render(self, counters=None, gauges=None):
+        """Prometheus text exposition format (version 0.0.4), plus extra counters and gauges"""
+        lines = []
+        name = f'{self.PREFIX}_stage_seconds'
+        lines.append(f'# HELP {name} Time spent per pipeline stage')
+        lines.append(f'# TYPE {name} histogram')
+        for stage, histogram in sorted(self.stages.items()):
+            self._render_histogram(lines, name, f'stage="{stage}"', histogram)
+
+        name = f'{self.PREFIX}_channel_stage_seconds'
+        lines.append(f'# HELP {name} Time spent per pipeline stage and channel')
+        lines.append(f'# TYPE {name} histogram')
+        for (stage, channel), histogram in sorted(self.channel_stages.items()):
+            self._render_histogram(lines, name, f'stage="{stage}",channel="{channel}"', histogram)
+
+        for counter, value in sorted((counters or {}).items()):
+            name = f'{self.PREFIX}_{counter}_total'
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {value}')
+
+        for gauge, value in sorted((gauges or {}).items()):
+            name = f'{self.PREFIX}_{gauge}'
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
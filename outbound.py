@@ -0,0 +1,84 @@
+import asyncio
+import itertools
+from batching import pack_entries
+
+PRIORITY_FORWARD = 0
+PRIORITY_LOG = 1
+
+
+class OutboundQueue:
+    """Prioritized queue for everything the scanner posts to Telegram
+
+    A single background sender drains the queue, always taking forwards
+    before log traffic. Log lines are not sent one by one: lines produced
+    within ``digest_window`` seconds are merged into one digest message
+    and handed to ``send_log(text)``.
+    """
+
+    def __init__(self, send_log, digest_window=10):
+        self.send_log = send_log
+        self.digest_window = digest_window
+        self._queue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._log_lines = []
+        self._digest_timer = None
+        self._sender = None
+
+    def submit(self, priority, factory):
+        """Queue ``factory()`` (a coroutine function) and return a future for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._order), factory, future))
+        return future
+
+    async def forward(self, factory):
+        """Run a forwarding call ahead of any queued log traffic"""
+        return await self.submit(PRIORITY_FORWARD, factory)
+
+    def log(self, text):
+        """Add a line to the next log digest without waiting for it to be sent"""
+        self._log_lines.append(text)
+        if self._digest_timer is None:
+            self._digest_timer = asyncio.get_running_loop().call_later(
+                self.digest_window, self._queue_digest
+            )
+
+    def _queue_digest(self):
+        self._digest_timer = None
+        lines, self._log_lines = self._log_lines, []
+        for text in pack_entries('', [f"{line}\n\n" for line in lines]):
+            self.submit(PRIORITY_LOG, lambda text=text: self._send_digest(text))
+
+    async def _send_digest(self, text):
+        try:
+            await self.send_log(text)
+        except Exception as e:
+            print(f"❌ Error logging message: {e}")
+
+    async def _run(self):
+        while True:
+            _, _, factory, future = await self._queue.get()
+            try:
+                result = await factory()
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        """Start the background sender"""
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Send pending logs, drain the queue and stop the sender"""
+        if self._digest_timer is not None:
+            self._digest_timer.cancel()
+        if self._log_lines:
+            self._queue_digest()
+        if self._sender is not None:
+            await self._queue.join()
+            self._sender.cancel()
+            self._sender = None
@@ -0,0 +1,103 @@
+import asyncio
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class MessageRecord:
+    """The parts of a Telegram message the scan pipeline needs
+
+    Keeps the text and the attached document (for file checks and content
+    scanning) but not the ``Message`` itself with its entities, media
+    wrappers and client reference.
+    """
+
+    __slots__ = ('id', 'text', 'document', 'page_end')
+
+    def __init__(self, message_id, text, document=None, page_end=False):
+        self.id = message_id
+        self.text = text
+        self.document = document
+        self.page_end = page_end
+
+    @classmethod
+    def from_message(cls, message, page_end=False):
+        return cls(message.id, message.text, message.document, page_end)
+
+
+class FoundConfig:
+    """A config found in a channel message"""
+
+    __slots__ = ('channel_id', 'message_id', 'type', 'config')
+
+    def __init__(self, channel_id, message_id, server_type, config_text):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.type = server_type
+        self.config = config_text
+
+
+class FoundFile:
+    """An attachment with one of the forwarded file extensions"""
+
+    __slots__ = ('channel_id', 'message_id', 'document_id', 'filename', 'extension', 'size')
+
+    def __init__(self, channel_id, message_id, document_id, filename, extension, size):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.document_id = document_id
+        self.filename = filename
+        self.extension = extension
+        self.size = size
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*(data[name] for name in cls.__slots__))
+
+
+async def run_pipeline(source, stages, maxsize=64):
+    """Drive an async iterable through stages joined by bounded queues
+
+    Each stage is ``async stage(item)`` returning an iterable of items for
+    the next stage; the last stage's return value is ignored. Every stage
+    runs as its own task and takes items in order, so order is kept end to
+    end, and at most ``maxsize`` items wait between two stages: a slow
+    stage holds back the ones before it instead of letting work pile up.
+    If any stage fails, the others are cancelled and the error is raised.
+    """
+    queues = [asyncio.Queue(maxsize) for _ in stages]
+
+    async def produce():
+        try:
+            async for item in source:
+                await queues[0].put(item)
+        finally:
+            await source.aclose()
+        await queues[0].put(_DONE)
+
+    async def consume(index, stage):
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            results = await stage(item)
+            if outbox is not None:
+                for result in results:
+                    await outbox.put(result)
+        if outbox is not None:
+            await outbox.put(_DONE)
+
+    tasks = [asyncio.ensure_future(produce())]
+    tasks += [asyncio.ensure_future(consume(i, stage)) for i, stage in enumerate(stages)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let the source and stages finish their cleanup before returning
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,105 @@
+import asyncio
+import ssl
+import time
+
+# Security modes that terminate TLS on the server port
+TLS_SECURITY = {'tls', 'xtls', 'reality'}
+
+
+class ProbeResult:
+    """Outcome of one liveness probe"""
+
+    __slots__ = ('ok', 'rtt', 'checked_at', 'error')
+
+    def __init__(self, ok, rtt=None, error=None):
+        self.ok = ok
+        self.rtt = rtt
+        self.checked_at = time.monotonic()
+        self.error = error
+
+
+class ServerProber:
+    """Concurrent TCP/TLS liveness and latency prober
+
+    Probes are plain ``asyncio.open_connection`` calls (with a TLS
+    handshake when the config uses TLS), bounded by a semaphore so
+    thousands of endpoints can be checked without starving the event loop.
+    Results are cached per host, port and TLS mode for ``cache_ttl``
+    seconds, and concurrent probes of the same endpoint share one attempt.
+    """
+
+    MAX_CACHE_ENTRIES = 50_000
+
+    def __init__(self, concurrency=200, timeout=5, cache_ttl=600):
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache = {}
+        self._inflight = {}
+        self._ssl = ssl.create_default_context()
+        # Liveness only: servers commonly use self-signed or borrowed certificates
+        self._ssl.check_hostname = False
+        self._ssl.verify_mode = ssl.CERT_NONE
+
+    def set_concurrency(self, concurrency):
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _connect(self, host, port, server_name):
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                if server_name is None:
+                    connect = asyncio.open_connection(host, port)
+                else:
+                    connect = asyncio.open_connection(
+                        host, port, ssl=self._ssl, server_hostname=server_name
+                    )
+                _, writer = await asyncio.wait_for(connect, self.timeout)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError) as e:
+                return ProbeResult(False, error=str(e) or type(e).__name__)
+            rtt = time.monotonic() - start
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), 1)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError):
+                pass
+            return ProbeResult(True, rtt=rtt)
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [k for k, r in self._cache.items() if now - r.checked_at >= self.cache_ttl]:
+            del self._cache[key]
+
+    async def probe(self, host, port, server_name=None):
+        """Probe one endpoint (TLS when server_name is given), cached"""
+        key = (host, port, server_name)
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached.checked_at < self.cache_ttl:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._connect(host, port, server_name))
+            self._inflight[key] = task
+            try:
+                result = await task
+            finally:
+                del self._inflight[key]
+            if len(self._cache) >= self.MAX_CACHE_ENTRIES:
+                self._prune()
+            self._cache[key] = result
+            return result
+        return await asyncio.shield(task)
+
+    async def probe_config(self, parsed):
+        """Probe a ParsedConfig, returns None when it can't be checked over TCP"""
+        if parsed is None or not parsed.host or not parsed.port or parsed.transport in ('udp', 'quic'):
+            return None
+        server_name = None
+        if parsed.security in TLS_SECURITY or parsed.type == 'trojan':
+            server_name = parsed.params.get('sni') or parsed.params.get('host') or parsed.host
+        return await self.probe(parsed.host, parsed.port, server_name)
+
+    async def probe_many(self, parsed_configs):
+        """Probe many configs concurrently, results in input order"""
+        return await asyncio.gather(*(self.probe_config(p) for p in parsed_configs))
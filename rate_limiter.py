@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Async token bucket shared by every coroutine that calls the API
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``.
+    Waiters are served in arrival order, so concurrent channel scans share
+    the budget fairly instead of racing for it.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate, capacity=None):
+        """Change the refill rate (and optionally the burst size)"""
+        self._refill()
+        self.rate = rate
+        if capacity is not None:
+            self.capacity = capacity
+            self._tokens = min(self._tokens, capacity)
+
+    def available(self):
+        """Tokens currently in the bucket"""
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, tokens=1):
+        """Wait until tokens are available, returns seconds spent waiting"""
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return time.monotonic() - start
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
@@ -0,0 +1,145 @@
+import asyncio
+import random
+import time
+from telethon import errors
+from rate_limiter import TokenBucket
+
+# Failures worth retrying besides FloodWait
+TRANSIENT_ERRORS = (errors.ServerError, ConnectionError, asyncio.TimeoutError)
+
+
+class RequestScheduler:
+    """Single gateway for Telegram API calls
+
+    Every call is charged to a shared token bucket. A FloodWait pauses all
+    callers for the requested time (plus jitter) and halves the request
+    rate; a run of successful calls raises it again additively up to the
+    configured ceiling, so throughput settles just under the account's real
+    limit. Transient server and connection errors are retried with jittered
+    exponential backoff.
+    """
+
+    # Successful calls needed before the rate is nudged back up
+    INCREASE_EVERY = 20
+    MIN_RATE_FACTOR = 0.1
+
+    def __init__(self, rate, burst, max_retries=5, max_flood_wait=600):
+        self.max_rate = rate
+        self.rate = rate
+        self.max_retries = max_retries
+        self.max_flood_wait = max_flood_wait
+        self.bucket = TokenBucket(rate, burst)
+        self._paused_until = 0
+        self._success_streak = 0
+        self._backing_off = False  # Rate lowered by a FloodWait and not yet recovered
+        self.metrics = None  # Optional Metrics receiving 'rate_limit_wait' timings
+        self.stats = {
+            'calls': 0,
+            'flood_waits': 0,
+            'flood_wait_seconds': 0,
+            'retries': 0,
+            'failures': 0
+        }
+
+    def configure(self, rate, burst, max_retries=None, max_flood_wait=None):
+        """Apply a new rate ceiling and retry policy
+
+        The rate moves to the new ceiling at once, unless it is still
+        backing off from a FloodWait; then it only drops if above it.
+        """
+        self.max_rate = rate
+        self.rate = min(self.rate, rate) if self._backing_off else rate
+        self.bucket.set_rate(self.rate, burst)
+        if max_retries is not None:
+            self.max_retries = max_retries
+        if max_flood_wait is not None:
+            self.max_flood_wait = max_flood_wait
+
+    def _on_flood(self, seconds):
+        self.stats['flood_waits'] += 1
+        self.stats['flood_wait_seconds'] += seconds
+        self._success_streak = 0
+        self._backing_off = True
+        self.rate = max(self.max_rate * self.MIN_RATE_FACTOR, self.rate / 2)
+        self.bucket.set_rate(self.rate)
+        jitter = random.uniform(0, 1 + seconds * 0.1)
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds + jitter)
+
+    def _on_success(self):
+        self._success_streak += 1
+        if self._success_streak >= self.INCREASE_EVERY and self.rate < self.max_rate:
+            self._success_streak = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+            self.bucket.set_rate(self.rate)
+            self._backing_off = self.rate < self.max_rate
+
+    def report_flood(self, seconds, attempt=0):
+        """Apply a FloodWait raised outside ``call`` (e.g. mid-download)
+
+        Pauses every caller like one seen by ``call``; returns whether the
+        request is worth retrying under the same retry policy.
+        """
+        self._on_flood(seconds)
+        if attempt >= self.max_retries or seconds > self.max_flood_wait:
+            self.stats['failures'] += 1
+            return False
+        self.stats['retries'] += 1
+        return True
+
+    def pause_remaining(self):
+        """Seconds left in the current account-wide FloodWait pause"""
+        return max(0.0, self._paused_until - time.monotonic())
+
+    async def wait_turn(self, tokens=1, reserve=0):
+        """Wait out any account-wide pause, then take tokens
+
+        With ``reserve``, first wait until the bucket would still hold that
+        many tokens afterwards, so background calls leave the burst to
+        callers without one.
+        """
+        tokens = min(tokens, self.bucket.capacity)
+        reserve = min(reserve, self.bucket.capacity - tokens)
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0 and reserve:
+                delay = (tokens + reserve - self.bucket.available()) / self.bucket.rate
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await self.bucket.acquire(tokens)
+
+    async def call(self, method, *args, **kwargs):
+        """Run an API call under the rate limit, retrying FloodWait and transient errors"""
+        return await self._call(method, args, kwargs)
+
+    async def call_background(self, cost, method, *args, **kwargs):
+        """Like ``call``, charged ``cost`` tokens and yielding to regular calls"""
+        return await self._call(method, args, kwargs, cost, self.bucket.capacity // 2)
+
+    async def _call(self, method, args, kwargs, tokens=1, reserve=0):
+        attempt = 0
+        while True:
+            if self.metrics is None:
+                await self.wait_turn(tokens, reserve)
+            else:
+                with self.metrics.time('rate_limit_wait'):
+                    await self.wait_turn(tokens, reserve)
+            self.stats['calls'] += 1
+            try:
+                result = await method(*args, **kwargs)
+            except errors.FloodWaitError as e:
+                self._on_flood(e.seconds)
+                if attempt >= self.max_retries or e.seconds > self.max_flood_wait:
+                    self.stats['failures'] += 1
+                    raise
+            except TRANSIENT_ERRORS:
+                if attempt >= self.max_retries:
+                    self.stats['failures'] += 1
+                    raise
+                await asyncio.sleep(min(60, 2 ** attempt) * random.uniform(0.5, 1.5))
+            else:
+                self._on_success()
+                return result
+
+            attempt += 1
+            self.stats['retries'] += 1
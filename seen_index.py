@@ -0,0 +1,125 @@
+import hashlib
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+
+# Punctuation that often sticks to links pasted inside sentences
+_TRAILING_PUNCTUATION = '.,;:!?)]}>"\''
+
+
+def normalize_config(value):
+    """Normalize a config string so cosmetic differences share one key"""
+    value = value.strip()
+    if '://' in value:
+        scheme, rest = value.split('://', 1)
+        return f"{scheme.lower()}://{rest.rstrip(_TRAILING_PUNCTUATION)}"
+    lines = (line.strip() for line in value.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def fingerprint(value):
+    """16-byte digest of the normalized config"""
+    return hashlib.blake2b(normalize_config(value).encode('utf-8'), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte fingerprints"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, fp):
+        h1 = int.from_bytes(fp[:8], 'little')
+        h2 = int.from_bytes(fp[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, fp):
+        for pos in self._positions(fp):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, fp):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fp))
+
+
+class SeenIndex:
+    """Persistent index of configs that were already forwarded
+
+    SQLite is the source of truth and survives restarts. A Bloom filter in
+    front answers the common "never seen" case without touching the
+    database, and an LRU cache answers repeats of recently seen configs, so
+    lookups stay constant time however many fingerprints are stored.
+    """
+
+    def __init__(self, path, ttl=0, cache_size=100_000, capacity=2_000_000):
+        self.path = path
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._bloom = BloomFilter(capacity)
+
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS seen ('
+            'fp BLOB PRIMARY KEY, seen_at REAL NOT NULL) WITHOUT ROWID'
+        )
+        self._db.commit()
+
+        for (fp,) in self._db.execute('SELECT fp FROM seen'):
+            self._bloom.add(fp)
+
+    def _remember(self, fp, seen_at):
+        self._cache[fp] = seen_at
+        self._cache.move_to_end(fp)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _fresh(self, seen_at, now):
+        return not self.ttl or now - seen_at < self.ttl
+
+    def contains(self, key):
+        """Check whether a config was seen within the TTL"""
+        fp = fingerprint(key)
+        now = time.time()
+
+        seen_at = self._cache.get(fp)
+        if seen_at is not None:
+            self._cache.move_to_end(fp)
+            return self._fresh(seen_at, now)
+
+        if fp not in self._bloom:
+            return False
+
+        row = self._db.execute('SELECT seen_at FROM seen WHERE fp = ?', (fp,)).fetchone()
+        if row is None:
+            return False
+        self._remember(fp, row[0])
+        return self._fresh(row[0], now)
+
+    def add(self, key):
+        """Record a config as seen now"""
+        fp = fingerprint(key)
+        now = time.time()
+        self._db.execute('INSERT OR REPLACE INTO seen (fp, seen_at) VALUES (?, ?)', (fp, now))
+        self._db.commit()
+        self._bloom.add(fp)
+        self._remember(fp, now)
+
+    def prune(self):
+        """Delete fingerprints older than the TTL, returns removed count"""
+        if not self.ttl:
+            return 0
+        cutoff = time.time() - self.ttl
+        cursor = self._db.execute('DELETE FROM seen WHERE seen_at < ?', (cutoff,))
+        self._db.commit()
+        for fp in [fp for fp, seen_at in self._cache.items() if seen_at < cutoff]:
+            del self._cache[fp]
+        return cursor.rowcount
+
+    def close(self):
+        self._db.close()
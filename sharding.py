@@ -0,0 +1,130 @@
+import asyncio
+import bisect
+import hashlib
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes
+
+    Removing a node only moves the keys it owned, each to the next node
+    clockwise; every other key keeps its owner.
+    """
+
+    def __init__(self, replicas=100):
+        self.replicas = replicas
+        self._points = []
+        self._owners = []
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def nodes_for(self, key):
+        """Distinct nodes in ring order starting at the key's owner"""
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _hash(key))
+        seen = set()
+        for i in range(len(self._points)):
+            owner = self._owners[(start + i) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+
+
+class Account:
+    """One Telegram session with its own rate limiter and scan slots
+
+    ``dialogs`` is the account's own DialogIndex, used to tell which
+    channels it can read; the controller account has none and can read
+    every channel it scans.
+    """
+
+    def __init__(self, name, client, scheduler, dialogs=None, phone=None, concurrency=1):
+        self.name = name
+        self.client = client
+        self.scheduler = scheduler
+        self.dialogs = dialogs
+        self.phone = phone
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+
+    def set_concurrency(self, concurrency):
+        if concurrency != self.concurrency:
+            self.concurrency = concurrency
+            self.semaphore = asyncio.Semaphore(concurrency)
+
+    def can_read(self, channel_id):
+        return self.dialogs is None or channel_id in self.dialogs
+
+    def available(self, failover_wait):
+        """Connected and not paused by a FloodWait longer than failover_wait"""
+        return self.client.is_connected() and self.scheduler.pause_remaining() <= failover_wait
+
+    async def call(self, method, *args, **kwargs):
+        """Call an API method through this account's scheduler"""
+        return await self.scheduler.call(method, *args, **kwargs)
+
+    async def call_background(self, cost, method, *args, **kwargs):
+        """Call an API method at background priority, charged cost tokens"""
+        return await self.scheduler.call_background(cost, method, *args, **kwargs)
+
+
+class AccountPool:
+    """Assigns channels to accounts by consistent hashing
+
+    The first account added is the controller: it handles commands and
+    forwarding and is the fallback when no other account can take a
+    channel. A channel goes to the first account clockwise from its hash
+    that is available and a member of the channel, so an account that is
+    flood-waiting or disconnected hands over only its own channels, and
+    gets them back once it recovers.
+    """
+
+    def __init__(self, failover_wait=60):
+        self.failover_wait = failover_wait
+        self.accounts = {}
+        self.controller = None
+        self.ring = HashRing()
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def __iter__(self):
+        return iter(self.accounts.values())
+
+    def add(self, account):
+        if self.controller is None:
+            self.controller = account
+        self.accounts[account.name] = account
+        self.ring.add(account.name)
+
+    def workers(self):
+        """Every account except the controller"""
+        return [a for a in self.accounts.values() if a is not self.controller]
+
+    def account_for(self, channel_id):
+        for name in self.ring.nodes_for(channel_id):
+            account = self.accounts[name]
+            if account.available(self.failover_wait) and account.can_read(channel_id):
+                return account
+        return self.controller
+
+    def assignments(self, channel_ids):
+        """Channels per account name under the current availability"""
+        counts = {name: 0 for name in self.accounts}
+        for channel_id in channel_ids:
+            counts[self.account_for(channel_id).name] += 1
+        return counts
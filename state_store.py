@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+
+
+class StateStore:
+    """Local JSON state file (settings, target group, stats, cursors)
+
+    Every write replaces the file atomically (temp file + ``os.replace``), so
+    a crash mid-write leaves the previous state intact.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._data = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            print(f"⚠️ Ignoring unreadable state file {path}: {e}")
+        if not isinstance(self._data, dict):
+            self._data = {}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def update(self, **values):
+        """Set one or more top-level keys and persist"""
+        self._data.update(values)
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.state-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+class ChannelCursors:
+    """Per-channel high-water marks (last processed message id) in the state store
+
+    ``set`` only updates memory; ``save`` persists at checkpoints, and the
+    scan journal covers the updates in between.
+    """
+
+    def __init__(self, store, key='cursors', legacy_path=None):
+        self.store = store
+        self.key = key
+        self._cursors = {int(k): int(v) for k, v in store.get(key, {}).items()}
+        self._dirty = False
+
+        # One-time import of the standalone cursor file used by older versions
+        if key not in store and legacy_path and os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, encoding='utf-8') as f:
+                    self._cursors = {int(k): int(v) for k, v in json.load(f).items()}
+                self._dirty = True
+                self.save()
+            except (ValueError, AttributeError) as e:
+                print(f"⚠️ Ignoring unreadable cursor file {legacy_path}: {e}")
+
+    def get(self, channel_id):
+        """Last processed message id, or None if the channel is new"""
+        return self._cursors.get(channel_id)
+
+    def set(self, channel_id, message_id):
+        """Advance a channel's cursor, returns whether it moved"""
+        if message_id <= self._cursors.get(channel_id, 0):
+            return False
+        self._cursors[channel_id] = message_id
+        self._dirty = True
+        return True
+
+    def save(self):
+        """Persist the cursors if any moved since the last save"""
+        if self._dirty:
+            self.store.update(**{self.key: {str(k): v for k, v in self._cursors.items()}})
+            self._dirty = False
@@ -0,0 +1,109 @@
+import binascii
+import math
+import re
+from collections import Counter
+
+# Candidate runs: standard or URL-safe alphabet, optional padding
+MIN_RUN = 64
+BASE64_RUN = re.compile(r'[A-Za-z0-9+/_-]{%d,}={0,2}' % MIN_RUN)
+BASE64_BYTES = re.compile(rb'[A-Za-z0-9+/_=-]+')
+WHITESPACE = re.compile(rb'\s+')
+URLSAFE = bytes.maketrans(b'-_', b'+/')
+
+# Markers that show a decoded prefix is a subscription list
+SUBSCRIPTION_MARKERS = (b'://', b'[Interface]')
+
+
+def _b64decode(data):
+    try:
+        return binascii.a2b_base64(data.translate(URLSAFE))
+    except binascii.Error:
+        return b''
+
+
+def entropy(sample):
+    """Shannon entropy of a string in bits per character"""
+    counts = Counter(sample)
+    total = len(sample)
+    return -sum(n / total * math.log2(n / total) for n in counts.values())
+
+
+def looks_like_subscription(decoded):
+    return any(marker in decoded for marker in SUBSCRIPTION_MARKERS)
+
+
+class Base64Stream:
+    """Incremental decoder for a base64 byte stream with arbitrary line wrapping"""
+
+    def __init__(self):
+        self._pending = b''
+
+    @staticmethod
+    def sniff(data, min_length=64):
+        """Whether the start of a file is a base64 subscription blob"""
+        head = WHITESPACE.sub(b'', data[:4096])
+        if len(head) < min_length or BASE64_BYTES.fullmatch(head) is None:
+            return False
+        usable = len(head) - len(head) % 4
+        return looks_like_subscription(_b64decode(head[:usable]))
+
+    def feed(self, data):
+        """Decode as much of the stream as is aligned to whole quads"""
+        data = self._pending + WHITESPACE.sub(b'', data)
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return _b64decode(data[:usable])
+
+    def close(self):
+        data, self._pending = self._pending.rstrip(b'='), b''
+        if not data:
+            return b''
+        return _b64decode(data + b'=' * (-len(data) % 4))
+
+
+class SubscriptionExpander:
+    """Finds base64 subscription blobs in a message and extracts what they contain
+
+    A run of at least ``MIN_RUN`` base64 characters in a whitespace-separated
+    token that is not a link (so not the payload of ``vmess://<base64>``
+    and the like) is a candidate. Its character entropy must look like
+    encoded data (this rejects hex digests and long identifiers), and only
+    its first ``PROBE_CHARS`` are decoded at first; the rest is decoded
+    only if that prefix contains a config marker. At most ``max_decoded``
+    bytes are decoded per message.
+    """
+
+    PROBE_CHARS = 512
+    MIN_ENTROPY = 4.5
+
+    def __init__(self, extractor, max_decoded=4 * 1024 * 1024):
+        self.extractor = extractor
+        self.max_decoded = max_decoded
+
+    @staticmethod
+    def candidates(text):
+        """Base64 runs in text that are not part of a link"""
+        # split() runs in C, so ordinary chatter costs almost nothing
+        for token in text.split():
+            if len(token) >= MIN_RUN and '://' not in token:
+                for run in BASE64_RUN.finditer(token):
+                    yield run.group()
+
+    def expand(self, text):
+        """Configs found inside the base64 blobs of text"""
+        found = []
+        budget = self.max_decoded
+        for run in self.candidates(text):
+            if budget <= 0:
+                break
+            if entropy(run[:self.PROBE_CHARS]) < self.MIN_ENTROPY:
+                continue
+            stream = Base64Stream()
+            head = stream.feed(run[:self.PROBE_CHARS].encode('ascii'))
+            if not looks_like_subscription(head):
+                continue
+            tail = run[self.PROBE_CHARS:self.PROBE_CHARS + budget * 4 // 3]
+            decoded = head + stream.feed(tail.encode('ascii')) + stream.close()
+            budget -= len(decoded)
+            found.extend(self.extractor.extract(decoded.decode('utf-8', errors='replace')))
+        return found
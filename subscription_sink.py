@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+class SubscriptionSink:
+    """Append-only per-type config logs served as base64 subscriptions
+
+    Each delivered config is appended as one JSON line to
+    ``<directory>/<type>.log`` and kept in memory keyed by its dedup key.
+    Entries older than ``ttl`` are dropped and the logs rewritten by
+    ``compact``. Rendered subscription bodies and their ETags are cached
+    until the next change, so serving a poll is a dictionary lookup.
+    Multi-line configs (WireGuard blocks) are logged but left out of the
+    subscription bodies, which are one link per line.
+    """
+
+    def __init__(self, directory, ttl=72 * 3600, compact_interval=3600):
+        self.directory = directory
+        self.ttl = ttl
+        self.compact_interval = compact_interval
+        self._entries = {}  # type -> {key: (added_at, config)}
+        self._files = {}
+        self._rendered = {}
+        self._compact_task = None
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith('.log'):
+                self._load(name[:-len('.log')])
+
+    def _path(self, server_type):
+        return os.path.join(self.directory, f"{server_type}.log")
+
+    def _load(self, server_type):
+        entries = self._entries.setdefault(server_type, {})
+        with open(self._path(server_type), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    entries[record['k']] = (record['t'], record['c'])
+                except (ValueError, KeyError, TypeError):
+                    # Torn last line from a crash mid-append
+                    continue
+
+    def _file(self, server_type):
+        f = self._files.get(server_type)
+        if f is None:
+            f = self._files[server_type] = open(self._path(server_type), 'a', encoding='utf-8')
+        return f
+
+    def add(self, server_type, key, config_text):
+        """Append a config unless its key is already in the log"""
+        entries = self._entries.setdefault(server_type, {})
+        if key in entries:
+            return False
+        now = time.time()
+        entries[key] = (now, config_text)
+        f = self._file(server_type)
+        f.write(json.dumps({'t': now, 'k': key, 'c': config_text}, ensure_ascii=False) + '\n')
+        f.flush()
+        self._rendered.pop(server_type, None)
+        self._rendered.pop(None, None)
+        return True
+
+    def compact(self):
+        """Drop expired entries and rewrite each log without them"""
+        cutoff = time.time() - self.ttl if self.ttl else None
+        for server_type, entries in self._entries.items():
+            if cutoff is not None:
+                for key in [k for k, (added_at, _) in entries.items() if added_at < cutoff]:
+                    del entries[key]
+            f = self._files.pop(server_type, None)
+            if f is not None:
+                f.close()
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.sink-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as out:
+                for key, (added_at, config_text) in entries.items():
+                    out.write(json.dumps({'t': added_at, 'k': key, 'c': config_text}, ensure_ascii=False) + '\n')
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self._path(server_type))
+        self._rendered.clear()
+
+    def render(self, server_type=None):
+        """(body, etag) of the base64 subscription for one type, or all types"""
+        cached = self._rendered.get(server_type)
+        if cached is None:
+            types = [server_type] if server_type else sorted(self._entries)
+            lines = [
+                config_text
+                for t in types
+                for _, config_text in self._entries.get(t, {}).values()
+                if '\n' not in config_text
+            ]
+            body = base64.b64encode('\n'.join(lines).encode('utf-8'))
+            etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            cached = self._rendered[server_type] = (body, etag)
+        return cached
+
+    def routes(self, server_types):
+        """HTTPServer routes: ``/sub`` for everything, ``/sub/<type>`` per type"""
+        def handler(server_type):
+            async def serve(headers):
+                body, etag = self.render(server_type)
+                response_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+                if etag in headers.get('if-none-match', ''):
+                    return 304, response_headers, b''
+                response_headers['Content-Type'] = 'text/plain; charset=utf-8'
+                return 200, response_headers, body
+            return serve
+
+        routes = {'/sub': handler(None)}
+        for server_type in server_types:
+            routes[f'/sub/{server_type}'] = handler(server_type)
+        return routes
+
+    async def _compact_loop(self):
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                self.compact()
+            except OSError as e:
+                print(f"❌ Error compacting subscription logs: {e}")
+
+    def start(self):
+        """Start periodic compaction"""
+        if self._compact_task is None:
+            self._compact_task = asyncio.create_task(self._compact_loop())
+
+    def close(self):
+        if self._compact_task is not None:
+            self._compact_task.cancel()
+            self._compact_task = None
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+
+# Stop event of the supervised task the current coroutine runs in
+_stop_event = contextvars.ContextVar('stop_event', default=None)
+
+
+class TaskSupervisor:
+    """Owns the scanner's long-running tasks by name
+
+    Each task gets its own stop event, visible to everything it runs
+    (including tasks it spawns) through a context variable. ``sleep`` is
+    the wait those tasks use between steps: it returns as soon as their
+    stop is requested, so a stop never waits out a scan interval or a
+    pacing delay. ``stop`` asks a task to finish and cancels it if it is
+    still running after ``grace`` seconds (e.g. stuck behind a FloodWait).
+    Only one task runs per name, so a restart cannot leave two loops
+    behind.
+    """
+
+    def __init__(self, grace=2):
+        self.grace = grace
+        self._tasks = {}
+
+    def running(self, name):
+        task = self._tasks.get(name)
+        return task is not None and not task.done()
+
+    def start(self, name, coro):
+        """Run coro as the named task, returns False if one is already running"""
+        if self.running(name):
+            coro.close()
+            return False
+        event = asyncio.Event()
+        token = _stop_event.set(event)
+        try:
+            task = asyncio.create_task(coro)
+        finally:
+            _stop_event.reset(token)
+        task.stop_event = event
+        task.add_done_callback(lambda t: self._report(name, t))
+        self._tasks[name] = task
+        return True
+
+    @staticmethod
+    def _report(name, task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"❌ Task {name} failed: {task.exception()!r}")
+
+    async def stop(self, name, grace=None):
+        """Request a stop, then cancel after the grace period; returns whether it was running"""
+        task = self._tasks.pop(name, None)
+        if task is None or task.done():
+            return False
+        task.stop_event.set()
+        if task is not asyncio.current_task():
+            if grace is None:
+                grace = self.grace
+            if grace > 0:
+                await asyncio.wait({task}, timeout=grace)
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+        return True
+
+    async def stop_all(self):
+        await asyncio.gather(*(self.stop(name) for name in list(self._tasks)))
+
+    @staticmethod
+    def stopping():
+        """Whether the calling task has been asked to stop"""
+        event = _stop_event.get()
+        return event is not None and event.is_set()
+
+    @staticmethod
+    async def sleep(seconds):
+        """Sleep, returning early (False) if the calling task is asked to stop"""
+        event = _stop_event.get()
+        if event is None:
+            await asyncio.sleep(seconds)
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), seconds)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+
+class CommandWorker:
+    """Bounded queue of commands run by a few worker tasks
+
+    Commands are accepted without waiting (``submit`` refuses them once
+    ``maxsize`` are queued) and run by up to ``workers`` tasks at once, so
+    a slow command neither blocks the client's update dispatch nor the
+    commands behind it. A command running past ``timeout`` is cancelled.
+    """
+
+    def __init__(self, handler, workers=4, maxsize=32, timeout=300):
+        self.handler = handler
+        self.workers = workers
+        self.timeout = timeout
+        self._queue = asyncio.Queue(maxsize)
+        self._tasks = []
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def submit(self, item):
+        """Queue an item for the handler, returns False if the queue is full"""
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await asyncio.wait_for(self.handler(item), self.timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Command timed out after {self.timeout}s")
+            except Exception as e:
+                print(f"❌ Command failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
@@ -1,23 +1,48 @@
 import asyncio
+import io
 import json
-import re
 import time
 import os
 from datetime import datetime, timedelta
-from telethon import TelegramClient, events, errors
+from telethon import TelegramClient, events, errors, utils
 from telethon.tl.functions.channels import CreateChannelRequest
 from telethon.tl.functions.messages import GetDialogsRequest
 from telethon.tl.types import InputPeerEmpty, DocumentAttributeFilename
 import config
+from extraction_pool import ExtractionPool
+from config_parser import parse_config
+from seen_index import SeenIndex
+from state_store import StateStore, ChannelCursors
+from request_scheduler import RequestScheduler
+from batching import ForwardBatcher, pack_entries
+from outbound import OutboundQueue
+from prober import ServerProber
+from dialog_index import DialogIndex
+from channel_scheduler import ChannelScheduler
+from metrics import Metrics
+from httpd import HTTPServer
+from file_scanner import StreamExtractor, DocumentCache
+from subscription import Base64Stream
+from subscription_sink import SubscriptionSink
+from sharding import Account, AccountPool
+from journal import Journal
+from backfill import Backfill
+from supervisor import TaskSupervisor, CommandWorker
+from pipeline import MessageRecord, FoundConfig, FoundFile, run_pipeline
+from archive import ConfigArchive
 
 class VPNScanner:
-    def __init__(self):
-        self.client = TelegramClient(
+    def __init__(self, client=None):
+        # A client can be injected (e.g. the offline benchmark's fake client)
+        self.client = client or TelegramClient(
             config.SESSION_NAME,
             config.API_ID,
-            config.API_HASH
+            config.API_HASH,
+            # Let FloodWaitError reach the request scheduler instead of sleeping inside Telethon
+            flood_sleep_threshold=0
         )
         self.scanning = False
+        self.realtime_channels = {}
         self.target_group_id = None
         self.log_channel_id = None
         self.settings = config.DEFAULT_SETTINGS.copy()
@@ -28,19 +53,230 @@ class VPNScanner:
             'last_scan': None,
             'start_time': None
         }
+        self.extraction_pool = ExtractionPool(
+            self.settings['ENABLED_SERVER_TYPES'],
+            workers=self.settings['EXTRACTION_WORKERS'],
+            threshold=self.settings['EXTRACTION_THRESHOLD'],
+            timeout=self.settings['EXTRACTION_TIMEOUT'],
+            expand=self.settings['EXPAND_SUBSCRIPTIONS']
+        )
+        self.seen_index = SeenIndex(
+            config.SEEN_INDEX_PATH,
+            ttl=self.settings['SEEN_TTL_HOURS'] * 3600
+        )
+        self.document_cache = DocumentCache(config.DOCUMENT_CACHE_PATH)
+        self.state = StateStore(config.STATE_PATH)
+        self.cursors = ChannelCursors(self.state, legacy_path=config.CURSOR_STORE_PATH)
+        self.journal = Journal(
+            config.JOURNAL_PATH,
+            flush_interval=self.settings['JOURNAL_FLUSH_SECONDS'],
+            fsync_interval=self.settings['JOURNAL_FSYNC_SECONDS']
+        )
+        self.backfill = Backfill(
+            self.state,
+            self.settings['BACKFILL_MESSAGES_PER_MINUTE'],
+            self.settings['BACKFILL_CHUNK_SIZE'],
+            max_messages=self.settings['BACKFILL_MAX_MESSAGES']
+        )
+        self.supervisor = TaskSupervisor()
+        self.commands = CommandWorker(self.run_command)
+        self.control_lock = asyncio.Lock()  # Start/stop/restart run one at a time
+        self.background_tasks = set()
+        self.metrics = Metrics()
+        self.metrics_server = None
+        self.sink = None
+        self.sink_server = None
+        self.archive = None
+        self.channel_scheduler = ChannelScheduler(
+            self.settings['SCAN_INTERVAL'],
+            self.settings['MIN_CHANNEL_INTERVAL'],
+            self.settings['MAX_CHANNEL_INTERVAL']
+        )
+        self.dialogs = DialogIndex(
+            self.client,
+            self.call_api,
+            refresh_interval=self.settings['DIALOG_REFRESH_INTERVAL'],
+            on_change=self.handle_dialogs_changed,
+            metrics=self.metrics
+        )
+        self.scheduler = RequestScheduler(
+            self.settings['API_RATE_PER_MINUTE'] / 60,
+            self.settings['API_BURST'],
+            max_retries=self.settings['API_MAX_RETRIES'],
+            max_flood_wait=self.settings['MAX_FLOOD_WAIT']
+        )
+        self.scheduler.metrics = self.metrics
+        self.accounts = AccountPool(failover_wait=self.settings['ACCOUNT_FAILOVER_WAIT'])
+        self.accounts.add(Account(config.SESSION_NAME, self.client, self.scheduler))
+        for account_config in config.ACCOUNTS:
+            self.accounts.add(self.make_account(account_config))
+        self.batcher = ForwardBatcher(
+            self.send_batch_text,
+            self.forward_batch_files,
+            self.mark_forwarded,
+            self.report_forward_error,
+            max_items=self.settings['BATCH_MAX_ITEMS'],
+            max_delay=self.settings['BATCH_FLUSH_SECONDS']
+        )
+        self.batcher.on_settled = self.journal.settled
+        self.outbound = OutboundQueue(
+            self.send_log_digest,
+            digest_window=self.settings['LOG_DIGEST_SECONDS']
+        )
+        
+    def apply_settings(self):
+        """Push current settings into the components that depend on them"""
+        self.extraction_pool.configure(
+            self.settings['ENABLED_SERVER_TYPES'],
+            self.settings['EXTRACTION_WORKERS'],
+            self.settings['EXTRACTION_THRESHOLD'],
+            self.settings['EXTRACTION_TIMEOUT'],
+            self.settings['EXPAND_SUBSCRIPTIONS']
+        )
+        self.seen_index.ttl = self.settings['SEEN_TTL_HOURS'] * 3600
+        self.scheduler.configure(
+            self.settings['API_RATE_PER_MINUTE'] / 60,
+            self.settings['API_BURST'],
+            max_retries=self.settings['API_MAX_RETRIES'],
+            max_flood_wait=self.settings['MAX_FLOOD_WAIT']
+        )
+        self.batcher.max_items = self.settings['BATCH_MAX_ITEMS']
+        self.batcher.max_delay = self.settings['BATCH_FLUSH_SECONDS']
+        self.outbound.digest_window = self.settings['LOG_DIGEST_SECONDS']
+        self.journal.flush_interval = self.settings['JOURNAL_FLUSH_SECONDS']
+        self.journal.fsync_interval = self.settings['JOURNAL_FSYNC_SECONDS']
+        self.dialogs.refresh_interval = self.settings['DIALOG_REFRESH_INTERVAL']
+        self.backfill.configure(
+            self.settings['BACKFILL_MESSAGES_PER_MINUTE'],
+            self.settings['BACKFILL_CHUNK_SIZE'],
+            self.settings['BACKFILL_MAX_MESSAGES']
+        )
+        self.channel_scheduler.base_interval = self.settings['SCAN_INTERVAL']
+        self.channel_scheduler.min_interval = self.settings['MIN_CHANNEL_INTERVAL']
+        self.channel_scheduler.max_interval = self.settings['MAX_CHANNEL_INTERVAL']
+        
+        # Extra accounts give up on FloodWaits they can hand over to another account
+        self.accounts.failover_wait = self.settings['ACCOUNT_FAILOVER_WAIT']
+        for account in self.accounts:
+            account.set_concurrency(self.settings['SCAN_CONCURRENCY'])
+        for account in self.accounts.workers():
+            account.scheduler.configure(
+                self.settings['API_RATE_PER_MINUTE'] / 60,
+                self.settings['API_BURST'],
+                max_retries=self.settings['API_MAX_RETRIES'],
+                max_flood_wait=min(self.settings['MAX_FLOOD_WAIT'], self.settings['ACCOUNT_FAILOVER_WAIT'])
+            )
+            account.dialogs.refresh_interval = self.settings['DIALOG_REFRESH_INTERVAL']
+        
+        if self.settings['PROBE_ENABLED']:
+            if self.batcher.prober is None:
+                self.batcher.prober = ServerProber()
+            self.batcher.prober.set_concurrency(self.settings['PROBE_CONCURRENCY'])
+            self.batcher.prober.timeout = self.settings['PROBE_TIMEOUT']
+            self.batcher.prober.cache_ttl = self.settings['PROBE_CACHE_TTL']
+        else:
+            self.batcher.prober = None
         
+        port = self.settings['METRICS_PORT']
+        if self.metrics_server is not None and (not self.settings['METRICS_ENABLED'] or self.metrics_server.port != port):
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.settings['METRICS_ENABLED'] and self.metrics_server is None:
+            self.metrics_server = HTTPServer({'/metrics': self.serve_metrics}, config.METRICS_HOST, port)
+            self.metrics_server.start()
+        
+        if self.settings['SINK_ENABLED']:
+            if self.sink is None:
+                self.sink = SubscriptionSink(config.SINK_DIR)
+                self.sink.start()
+            self.sink.ttl = self.settings['SINK_TTL_HOURS'] * 3600
+            self.sink.compact_interval = self.settings['SINK_COMPACT_INTERVAL']
+        elif self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        
+        if self.settings['ARCHIVE_ENABLED']:
+            if self.archive is None:
+                self.archive = ConfigArchive(config.ARCHIVE_PATH)
+            self.archive.retention = self.settings['ARCHIVE_RETENTION_DAYS'] * 86400
+            self.archive.max_rows = self.settings['ARCHIVE_MAX_ROWS']
+        elif self.archive is not None:
+            self.archive.close()
+            self.archive = None
+        
+        port = self.settings['SINK_PORT']
+        if self.sink_server is not None and (self.sink is None or self.sink_server.port != port):
+            self.sink_server.stop()
+            self.sink_server = None
+        if self.sink is not None and self.sink_server is None:
+            self.sink_server = HTTPServer(self.sink.routes(config.VPN_PATTERNS), config.SINK_HOST, port)
+            self.sink_server.start()
+    
+    def make_account(self, account_config):
+        """Build (but do not start) an extra scanning account"""
+        client = TelegramClient(
+            account_config['session'],
+            account_config.get('api_id', config.API_ID),
+            account_config.get('api_hash', config.API_HASH),
+            flood_sleep_threshold=0
+        )
+        scheduler = RequestScheduler(
+            self.settings['API_RATE_PER_MINUTE'] / 60,
+            self.settings['API_BURST']
+        )
+        scheduler.metrics = self.metrics
+        dialogs = DialogIndex(client, scheduler.call, refresh_interval=self.settings['DIALOG_REFRESH_INTERVAL'])
+        return Account(account_config['session'], client, scheduler, dialogs, phone=account_config.get('phone'))
+    
+    async def start_accounts(self):
+        """Connect the extra scanning accounts and index their channels"""
+        for account in self.accounts.workers():
+            try:
+                await account.client.start(phone=account.phone)
+                await account.dialogs.build()
+                account.dialogs.register()
+                account.dialogs.start()
+                await self.log_message(
+                    f"👥 Account {account.name} ready: {len(account.dialogs.channels())} channels"
+                )
+            except Exception as e:
+                # Stays disconnected, so its channels fall to the other accounts
+                await self.log_message(f"❌ Error starting account {account.name}: {e}")
+    
+    def sink_only(self):
+        """Whether configs go only to the subscription sink, not the target group"""
+        return self.sink is not None and self.settings['SINK_ONLY']
+    
+    def concurrent_scanning(self):
+        """Whether channels are scanned in parallel under the rate limiters"""
+        return self.settings['SCAN_CONCURRENCY'] > 1 or len(self.accounts) > 1
+    
+    async def call_api(self, method, *args, **kwargs):
+        """Call a Telegram API method through the shared request scheduler"""
+        return await self.scheduler.call(method, *args, **kwargs)
+    
     async def start(self):
         """Initialize and start the client"""
         await self.client.start(phone=config.PHONE_NUMBER)
-        me = await self.client.get_me()
+        self.outbound.start()
+        me = await self.call_api(self.client.get_me)
         
         # Load previous settings
         await self.load_settings()
         await self.load_target_group()
+        self.load_scan_stats()
+        
+        # Index dialogs once, then follow membership changes incrementally
+        await self.dialogs.build()
+        self.dialogs.register()
+        self.dialogs.start()
         
         # Create or get log channel
         await self.setup_log_channel()
         
+        self.batcher.start()
+        await self.start_accounts()
+        
         # Send startup message
         await self.log_message(
             f"🤖 **VPN Scanner Started**\n\n"
@@ -53,50 +289,76 @@ class VPNScanner:
             f"• `{config.COMMANDS['start']}` - Start scanning\n"
             f"• `{config.COMMANDS['stop']}` - Stop scanning\n"
             f"• `{config.COMMANDS['status']}` - Show status\n"
+            f"• `{config.COMMANDS['stats']}` - Show stage timings\n"
+            f"• `{config.COMMANDS['backfill']} [CHANNEL_ID|stop]` - Mine channel history\n"
+            f"• `{config.COMMANDS['search']} QUERY` - Search archived configs "
+            f"(e.g. `type:trojan port:443 since:1d`)\n"
+            f"• `{config.COMMANDS['export']} QUERY` - Export matching configs as a file\n"
             f"• `{config.COMMANDS['settings']}` - Configure settings\n"
             f"• `{config.COMMANDS['toggle_files']}` - Toggle file forwarding\n"
+            f"• `{config.COMMANDS['toggle_realtime']}` - Toggle real-time mode\n"
             f"• `{config.COMMANDS['restart']}` - Restart scanner"
         )
         
     async def setup_log_channel(self):
         """Create or find log channel"""
+        self.log_channel_id = self.state.get('log_channel_id')
+        if self.log_channel_id:
+            return
+        
         try:
             # Check if log channel already exists
-            async for dialog in self.client.iter_dialogs():
-                if dialog.title == "VPN Scanner Logs" and dialog.is_channel:
-                    self.log_channel_id = dialog.id
-                    return
+            self.log_channel_id = self.dialogs.find("VPN Scanner Logs")
+            if self.log_channel_id:
+                self.state.update(log_channel_id=self.log_channel_id)
+                return
                     
             # Create new log channel
-            result = await self.client(CreateChannelRequest(
+            result = await self.call_api(self.client, CreateChannelRequest(
                 title="VPN Scanner Logs",
                 about="Automated logs for VPN Scanner Bot",
                 broadcast=True
             ))
             
-            self.log_channel_id = result.chats[0].id
+            self.log_channel_id = utils.get_peer_id(result.chats[0])
+            self.state.update(log_channel_id=self.log_channel_id)
             await self.log_message("📋 **Log Channel Created Successfully**")
             
         except Exception as e:
             print(f"❌ Error setting up log channel: {e}")
     
     async def log_message(self, message):
-        """Send message to log channel and saved messages"""
-        try:
-            # Send to log channel
-            if self.log_channel_id:
-                await self.client.send_message(self.log_channel_id, message)
-            
-            # Also send to saved messages as backup
-            await self.client.send_message('me', f"[LOG] {message}")
-            
-        except Exception as e:
-            print(f"❌ Error logging message: {e}")
+        """Queue message for the next log digest"""
+        self.outbound.log(message)
+    
+    async def send_log_digest(self, text):
+        """Send a log digest to log channel and, optionally, saved messages"""
+        # Send to log channel
+        if self.log_channel_id:
+            await self.call_api(self.client.send_message, self.log_channel_id, text)
+        
+        # Saved messages mirror, or fallback while there is no log channel
+        if self.settings['LOG_TO_SAVED_MESSAGES'] or not self.log_channel_id:
+            await self.call_api(self.client.send_message, 'me', f"[LOG] {text}")
     
     async def load_settings(self):
-        """Load scanner settings from saved messages"""
+        """Load scanner settings from the local state store"""
+        saved = self.state.get('settings')
+        if saved is None:
+            # First run with local state: import what older versions kept in saved messages
+            await self.import_saved_message_settings()
+            self.state.update(settings=self.settings)
+        else:
+            for key, value in saved.items():
+                if key in self.settings and isinstance(value, type(self.settings[key])):
+                    self.settings[key] = value
+        
+        self.apply_settings()
+    
+    async def import_saved_message_settings(self):
+        """Parse the settings message older versions kept in saved messages"""
         try:
-            async for message in self.client.iter_messages('me', limit=50):
+            for message in await self.call_api(self.client.get_messages, 'me', limit=50):
                 if message.text and config.SETTINGS_KEY in message.text:
                     lines = message.text.split('\n')
                     for line in lines:
@@ -118,7 +380,9 @@ class VPNScanner:
             await self.log_message(f"❌ Error loading settings: {e}")
     
     async def save_settings(self):
-        """Save current settings to saved messages"""
+        """Save current settings locally and mirror them to saved messages"""
+        self.state.update(settings=self.settings)
+        
         settings_text = f"{config.SETTINGS_KEY}\n\n"
         settings_text += "**Current VPN Scanner Settings:**\n\n"
         for key, value in self.settings.items():
@@ -126,23 +390,17 @@ class VPNScanner:
                 settings_text += f"{key} = {','.join(map(str, value))}\n"
             else:
                 settings_text += f"{key} = {value}\n"
-        
-        # Find and update existing settings message
-        try:
-            async for message in self.client.iter_messages('me', limit=50):
-                if message.text and config.SETTINGS_KEY in message.text:
-                    await message.edit(settings_text)
-                    return
-        except:
-            pass
-        
-        # Create new settings message
-        await self.client.send_message('me', settings_text)
+        self.mirror_to_saved_messages(config.SETTINGS_KEY, settings_text)
     
     async def load_target_group(self):
-        """Load target group ID from saved messages"""
+        """Load target group ID from the local state store"""
+        if 'target_group_id' in self.state:
+            self.target_group_id = self.state.get('target_group_id')
+            return
+        
+        # Import from the saved messages entry older versions wrote
         try:
-            async for message in self.client.iter_messages('me', limit=50):
+            for message in await self.call_api(self.client.get_messages, 'me', limit=50):
                 if message.text and config.TARGET_GROUP_KEY in message.text:
                     lines = message.text.split('\n')
                     for line in lines:
@@ -150,76 +408,122 @@ class VPNScanner:
                             self.target_group_id = int(line.split('GROUP_ID:')[1].strip())
                             break
                     break
+            self.state.update(target_group_id=self.target_group_id)
         except Exception as e:
             await self.log_message(f"❌ Error loading target group: {e}")
     
     async def save_target_group(self, group_id):
-        """Save target group ID to saved messages"""
-        target_text = f"{config.TARGET_GROUP_KEY}\n\nGROUP_ID: {group_id}"
-        
-        # Find and update existing target message
+        """Save target group ID locally and mirror it to saved messages"""
+        self.state.update(target_group_id=group_id)
+        self.mirror_to_saved_messages(
+            config.TARGET_GROUP_KEY,
+            f"{config.TARGET_GROUP_KEY}\n\nGROUP_ID: {group_id}"
+        )
+    
+    def mirror_to_saved_messages(self, key, text):
+        """Update the saved messages copy of a state entry in the background"""
+        if not self.settings['STATE_MIRROR_ENABLED']:
+            return
+        task = asyncio.create_task(self.write_saved_message(key, text))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+    
+    async def write_saved_message(self, key, text):
+        """Edit the saved message tagged with key, or send a new one"""
         try:
-            async for message in self.client.iter_messages('me', limit=50):
-                if message.text and config.TARGET_GROUP_KEY in message.text:
-                    await message.edit(target_text)
+            # Find and update existing message
+            for message in await self.call_api(self.client.get_messages, 'me', limit=50):
+                if message.text and key in message.text:
+                    await self.call_api(message.edit, text)
                     return
-        except:
-            pass
+            
+            # Create new message
+            await self.call_api(self.client.send_message, 'me', text)
+        except Exception as e:
+            print(f"❌ Error mirroring state to saved messages: {e}")
+    
+    def load_scan_stats(self):
+        """Restore lifetime counters from the local state store"""
+        saved = self.state.get('scan_stats', {})
+        for key in ('total_scans', 'servers_found', 'files_forwarded'):
+            self.scan_stats[key] = saved.get(key, 0)
+        if saved.get('last_scan'):
+            self.scan_stats['last_scan'] = datetime.fromisoformat(saved['last_scan'])
+    
+    def save_scan_stats(self):
+        """Persist lifetime counters to the local state store"""
+        last_scan = self.scan_stats['last_scan']
+        self.state.update(scan_stats={
+            'total_scans': self.scan_stats['total_scans'],
+            'servers_found': self.scan_stats['servers_found'],
+            'files_forwarded': self.scan_stats['files_forwarded'],
+            'last_scan': last_scan.isoformat() if last_scan else None
+        })
+    
+    def record_progress(self, channel_id, message_id):
+        """Advance a channel's cursor and journal it with the current counters"""
+        if self.cursors.set(channel_id, message_id):
+            self.journal.progress(channel_id, message_id, {
+                'total_scans': self.scan_stats['total_scans'],
+                'servers_found': self.scan_stats['servers_found'],
+                'files_forwarded': self.scan_stats['files_forwarded']
+            })
+    
+    def checkpoint(self):
+        """Persist cursors and counters, then drop everything but unsent items from the journal"""
+        self.cursors.save()
+        self.backfill.save()
+        self.save_scan_stats()
+        self.journal.compact()
+    
+    async def replay_journal(self):
+        """Recover cursors, counters and unsent items left by an interrupted run"""
+        pending, cursors, stats = self.journal.replay()
+        for channel_id, message_id in cursors.items():
+            self.cursors.set(channel_id, message_id)
+        if stats:
+            for key, value in stats.items():
+                self.scan_stats[key] = max(self.scan_stats[key], value)
+        
+        requeued = 0
+        for key, item in pending.items():
+            if self.seen_index.contains(key) or self.batcher.is_pending(key):
+                # Delivered before the crash, only the settle record was lost
+                self.journal.settled([key])
+            elif item['kind'] == 'config':
+                parsed = parse_config(item['type'], item['config'])
+                await self.batcher.add_config(item['type'], item['config'], item['source'], key, parsed)
+                requeued += 1
+            else:
+                file_info = FoundFile.from_dict(item['file_info'])
+                await self.batcher.add_file(item['channel_id'], item['source'], file_info, key)
+                requeued += 1
         
-        # Create new target message
-        await self.client.send_message('me', target_text)
+        self.checkpoint()
+        if requeued or cursors:
+            await self.log_message(
+                f"♻️ **Recovered from journal:** {requeued} unsent items requeued, "
+                f"{len(cursors)} channel cursors restored"
+            )
     
     async def get_channels_list(self):
         """Get list of all channels the account has joined"""
-        channels = []
-        try:
-            async for dialog in self.client.iter_dialogs():
-                if dialog.is_channel and not dialog.is_group:
-                    channels.append({
-                        'id': dialog.id,
-                        'title': dialog.title,
-                        'username': dialog.entity.username or 'No username'
-                    })
-            return channels
-        except Exception as e:
-            await self.log_message(f"❌ Error getting channels: {e}")
-            return []
+        return self.dialogs.channels()
     
     async def get_groups_list(self):
         """Get list of all groups the account has joined"""
-        groups = []
-        try:
-            async for dialog in self.client.iter_dialogs():
-                if dialog.is_group:
-                    groups.append({
-                        'id': dialog.id,
-                        'title': dialog.title,
-                        'participants': getattr(dialog.entity, 'participants_count', 'Unknown')
-                    })
-            return groups
-        except Exception as e:
-            await self.log_message(f"❌ Error getting groups: {e}")
-            return []
+        return self.dialogs.groups()
     
-    def extract_vpn_configs(self, text):
-        """Extract VPN configurations from text"""
-        found_configs = []
-        
-        for server_type in self.settings['ENABLED_SERVER_TYPES']:
-            if server_type not in config.VPN_PATTERNS:
-                continue
-                
-            for pattern in config.VPN_PATTERNS[server_type]:
-                matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-                for match in matches:
-                    found_configs.append({
-                        'type': server_type,
-                        'config': match.strip()
-                    })
-        
-        return found_configs
+    async def handle_dialogs_changed(self):
+        """Follow channel joins/leaves in the real-time subscription"""
+        if self.scanning and self.realtime_channels:
+            self.enable_realtime(await self.get_channels_list())
+    
+    async def extract_vpn_configs(self, text):
+        """Extract VPN configurations from text (large texts in a worker process)"""
+        return await self.extraction_pool.extract(text)
     
-    async def check_file_extension(self, message):
+    async def check_file_extension(self, message, channel_id):
         """Check if message contains file with target extensions"""
         if not message.document:
             return None
@@ -237,54 +541,310 @@ class VPNScanner:
         # Check if extension matches
         for ext in self.settings['ENABLED_FILE_EXTENSIONS']:
             if filename.lower().endswith(ext.lower()):
-                return {
-                    'filename': filename,
-                    'extension': ext,
-                    'size': message.document.size
-                }
+                return FoundFile(
+                    channel_id,
+                    message.id,
+                    message.document.id,
+                    filename,
+                    ext,
+                    message.document.size
+                )
         
         return None
     
+    @staticmethod
+    def found_configs(channel_id, message_id, configs):
+        """Compact records for extracted {'type', 'config'} dicts"""
+        return [FoundConfig(channel_id, message_id, c['type'], c['config']) for c in configs]
+    
+    def scannable_document(self, message):
+        """Whether an attachment's contents should be streamed through the extractor"""
+        document = message.document
+        if not document or not self.settings['FILE_CONTENT_SCAN']:
+            return False
+        if document.size > self.settings['FILE_SCAN_MAX_BYTES']:
+            return False
+        for attr in document.attributes:
+            if isinstance(attr, DocumentAttributeFilename):
+                name = attr.file_name.lower()
+                return any(name.endswith(ext.lower()) for ext in self.settings['FILE_SCAN_EXTENSIONS'])
+        return False
+    
+    async def scan_document(self, message, channel, channel_stats, account):
+        """Stream an attachment and forward the configs inside it"""
+        document = message.document
+        if self.document_cache.contains(document.id):
+            return
+        
+        stream = StreamExtractor(self.extraction_pool.extractor)
+        chunks = None
+        received = 0
+        found = 0
+        attempt = 0
+        base64_stream = None
+        try:
+            with self.metrics.time('file_scan', channel['id']):
+                while received < self.settings['FILE_SCAN_MAX_BYTES']:
+                    if chunks is None:
+                        # Downloaded by the account that fetched the message
+                        chunks = account.client.iter_download(
+                            document, offset=received, request_size=config.FILE_SCAN_CHUNK_SIZE
+                        )
+                    # Each chunk is one API request, charged like any other call
+                    await account.scheduler.wait_turn()
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    except errors.FloodWaitError as e:
+                        # Pause the whole account, then resume the download where it stopped
+                        await chunks.close()
+                        chunks = None
+                        if not account.scheduler.report_flood(e.seconds, attempt):
+                            raise
+                        attempt += 1
+                        continue
+                    # A file that is one base64 subscription blob is decoded on the fly
+                    if not received and self.settings['EXPAND_SUBSCRIPTIONS'] and Base64Stream.sniff(chunk):
+                        base64_stream = Base64Stream()
+                    received += len(chunk)
+                    if base64_stream is not None:
+                        chunk = base64_stream.feed(chunk)
+                    text = stream.decode(chunk)
+                    hits = await self.extraction_pool.finditer(text)
+                    configs = self.found_configs(channel['id'], message.id, stream.settle(text, hits))
+                    found += await self.forward_configs(configs, channel, channel_stats)
+                text = stream.decode(base64_stream.close() if base64_stream else b'', final=True)
+                hits = await self.extraction_pool.finditer(text)
+                configs = self.found_configs(channel['id'], message.id, stream.settle(text, hits, final=True))
+                found += await self.forward_configs(configs, channel, channel_stats)
+        finally:
+            # Stopping at FILE_SCAN_MAX_BYTES (or on an error) leaves the download open
+            if chunks is not None:
+                await chunks.close()
+        
+        self.document_cache.add(document.id, received, found)
+    
+    async def forward_configs(self, configs, channel, channel_stats):
+        """Forward extracted configs, returns how many were new"""
+        forwarded = 0
+        for config_data in configs:
+            with self.metrics.time('forward', channel['id']):
+                success = await self.forward_content(
+                    config_data,
+                    channel['title'],
+                    'server'
+                )
+            if success:
+                forwarded += 1
+                channel_stats['servers_found'] += 1
+                self.scan_stats['servers_found'] += 1
+        return forwarded
+    
     async def forward_content(self, content, source_channel, content_type='server'):
-        """Forward VPN config or file to target group"""
-        if not self.target_group_id:
+        """Queue VPN config or file for batched forwarding to target group"""
+        if content_type == 'server':
+            # Same server with a different remark or param order shares one key
+            parsed = parse_config(content.type, content.config)
+            seen_key = f"cfg:{parsed.fingerprint}" if parsed else content.config
+            # Every sighting is archived, forwarded or not
+            if self.archive is not None:
+                self.archive.add(seen_key, content.type, content.config, parsed, source_channel, content.channel_id)
+        else:
+            seen_key = f"file:{content.document_id}"
+        
+        if not self.target_group_id and not (content_type == 'server' and self.sink_only()):
             return False
+        
+        # Skip anything already forwarded within the TTL or already queued
+        if self.batcher.is_pending(seen_key) or self.seen_index.contains(seen_key):
+            return False
+        
+        if content_type == 'server' and self.sink is not None:
+            self.sink.add(content.type, seen_key, content.config)
+            if self.sink_only():
+                self.seen_index.add(seen_key)
+                return True
+            
+        # Journal before queueing, so a crash before delivery is replayed
+        if content_type == 'server':
+            self.journal.found(seen_key, {
+                'kind': 'config',
+                'type': content.type,
+                'config': content.config,
+                'source': source_channel
+            })
+        elif content_type == 'file':
+            self.journal.found(seen_key, {
+                'kind': 'file',
+                'channel_id': content.channel_id,
+                'source': source_channel,
+                'file_info': content.as_dict()
+            })
+        
+        if content_type == 'server':
+            await self.batcher.add_config(
+                content.type,
+                content.config,
+                source_channel,
+                seen_key,
+                parsed
+            )
+        elif content_type == 'file':
+            await self.batcher.add_file(content.channel_id, source_channel, content, seen_key)
+        
+        return True
+    
+    async def send_batch_text(self, text):
+        """Send one packed batch message to the target group"""
+        await self.outbound.forward(
+            lambda: self.call_api(self.client.send_message, self.target_group_id, text)
+        )
+    
+    async def forward_batch_files(self, channel_id, message_ids):
+        """Forward a channel's batched file messages in one call"""
+        await self.outbound.forward(
+            lambda: self.call_api(
+                self.client.forward_messages,
+                self.target_group_id,
+                message_ids,
+                channel_id
+            )
+        )
+    
+    def mark_forwarded(self, seen_keys):
+        """Record delivered batch entries in the seen index"""
+        for seen_key in seen_keys:
+            self.seen_index.add(seen_key)
+    
+    async def report_forward_error(self, error):
+        """Log a batch that could not be delivered"""
+        await self.log_message(f"❌ Error forwarding content: {error}")
+    
+    async def extract_message(self, record, channel, channel_stats, account):
+        """Configs and files found in one message (attachment contents are forwarded as they stream)"""
+        channel_stats['messages_scanned'] += 1
+        found = []
+        
+        # Check for VPN configs in text
+        if record.text:
+            with self.metrics.time('extract', channel['id']):
+                configs = await self.extract_vpn_configs(record.text)
+            found.extend(self.found_configs(channel['id'], record.id, configs))
+        
+        # Configs inside attached text files
+        if self.scannable_document(record):
+            try:
+                await self.scan_document(record, channel, channel_stats, account)
+            except Exception as e:
+                await self.log_message(f"❌ Error scanning file in {channel['title']}: {e}")
+        
+        # Check for files if enabled
+        if self.settings['FILE_FORWARDING_ENABLED']:
+            file_info = await self.check_file_extension(record, channel['id'])
+            if file_info:
+                found.append(file_info)
+        
+        return found
+    
+    async def forward_found(self, found, channel, channel_stats):
+        """Forward a message's configs and files"""
+        await self.forward_configs([item for item in found if isinstance(item, FoundConfig)], channel, channel_stats)
+        for file_info in found:
+            if not isinstance(file_info, FoundFile):
+                continue
+            with self.metrics.time('forward', channel['id']):
+                success = await self.forward_content(file_info, channel['title'], 'file')
+            if success:
+                channel_stats['files_forwarded'] += 1
+                self.scan_stats['files_forwarded'] += 1
+    
+    async def process_message(self, message, channel, channel_stats, account=None):
+        """Extract and forward configs and files from one message"""
+        account = account or self.accounts.controller
+        found = await self.extract_message(MessageRecord.from_message(message), channel, channel_stats, account)
+        await self.forward_found(found, channel, channel_stats)
+    
+    async def scan_messages(self, records, channel, channel_stats, account, on_progress=None, pace=False):
+        """Run message records through the extract and forward stages
+
+        ``records`` is an async iterator of MessageRecord; fetching,
+        extraction and forwarding overlap, with bounded queues between
+        them. ``on_progress(message_id)`` is called at every page end and
+        for the last message forwarded. With ``pace``, sequential mode
+        waits DELAY_BETWEEN_MESSAGES after each message.
+        """
+        progress = {'last': None, 'reported': None}
+        
+        async def extract(record):
+            found = await self.extract_message(record, channel, channel_stats, account)
+            return [(record.id, record.page_end, found)]
+        
+        async def forward(item):
+            message_id, page_end, found = item
+            await self.forward_found(found, channel, channel_stats)
+            progress['last'] = message_id
+            if page_end and on_progress is not None:
+                on_progress(message_id)
+                progress['reported'] = message_id
             
+            # Fixed pacing only in sequential mode; concurrent mode relies on the rate limiter
+            if pace and not self.concurrent_scanning():
+                with self.metrics.time('pacing_sleep'):
+                    await self.supervisor.sleep(self.settings['DELAY_BETWEEN_MESSAGES'])
+            return ()
+        
         try:
-            if content_type == 'server':
-                # Forward VPN server config
-                caption = (
-                    f"🔒 **{content['type'].upper()} Server**\n\n"
-                    f"📡 Source: {source_channel}\n"
-                    f"⏰ Found: {datetime.now().strftime('%H:%M:%S')}\n\n"
-                    f"``````"
-                )
-                await self.client.send_message(self.target_group_id, caption)
-                
-            elif content_type == 'file':
-                # Forward file with caption
-                caption = (
-                    f"📁 **VPN Config File**\n\n"
-                    f"📄 Filename: `{content['filename']}`\n"
-                    f"📊 Size: {content['size']} bytes\n"
-                    f"📡 Source: {source_channel}\n"
-                    f"⏰ Found: {datetime.now().strftime('%H:%M:%S')}"
-                )
-                await self.client.forward_messages(
-                    self.target_group_id,
-                    content['message'],
-                    source_channel
-                )
-                await self.client.send_message(self.target_group_id, caption)
+            await run_pipeline(records, [extract, forward], maxsize=self.settings['MAX_MESSAGES_PER_SCAN'])
+        finally:
+            if on_progress is not None and progress['last'] not in (None, progress['reported']):
+                on_progress(progress['last'])
+        return progress['last']
+    
+    async def fetch_new_messages(self, channel, account):
+        """Yield records of a channel's messages newer than its cursor, a page at a time, oldest first"""
+        page_size = self.settings['MAX_MESSAGES_PER_SCAN']
+        min_id = self.cursors.get(channel['id'])
+        
+        while self.scanning:
+            with self.metrics.time('get_messages', channel['id']):
+                if min_id is None:
+                    # First visit: start from the newest messages
+                    messages = await account.call(
+                        account.client.get_messages,
+                        channel['id'],
+                        limit=page_size
+                    )
+                    messages.reverse()
+                else:
+                    # Only messages newer than the cursor, oldest first
+                    messages = await account.call(
+                        account.client.get_messages,
+                        channel['id'],
+                        limit=page_size,
+                        min_id=min_id,
+                        reverse=True
+                    )
             
-            return True
+            # Keep only compact records, not the Message objects
+            records = [MessageRecord.from_message(message) for message in messages]
+            del messages
+            if records:
+                records[-1].page_end = True
             
-        except Exception as e:
-            await self.log_message(f"❌ Error forwarding content: {e}")
-            return False
+            for record in records:
+                if not self.scanning:
+                    return
+                yield record
+            
+            # Caught up, or bootstrapped a new channel
+            if min_id is None or len(records) < page_size:
+                return
+            min_id = records[-1].id
     
-    async def scan_channel(self, channel):
+    async def scan_channel(self, channel, account=None):
         """Scan a specific channel for VPN configs"""
+        account = account or self.accounts.controller
         channel_stats = {
             'servers_found': 0,
             'files_forwarded': 0,
@@ -292,48 +852,15 @@ class VPNScanner:
         }
         
         try:
-            # Get recent messages
-            messages = await self.client.get_messages(
-                channel['id'],
-                limit=self.settings['MAX_MESSAGES_PER_SCAN']
+            await self.scan_messages(
+                self.fetch_new_messages(channel, account),
+                channel,
+                channel_stats,
+                account,
+                on_progress=lambda message_id: self.record_progress(channel['id'], message_id),
+                pace=True
             )
             
-            for message in messages:
-                if not self.scanning:
-                    break
-                    
-                channel_stats['messages_scanned'] += 1
-                
-                # Check for VPN configs in text
-                if message.text:
-                    configs = self.extract_vpn_configs(message.text)
-                    for config_data in configs:
-                        success = await self.forward_content(
-                            config_data,
-                            channel['title'],
-                            'server'
-                        )
-                        if success:
-                            channel_stats['servers_found'] += 1
-                            self.scan_stats['servers_found'] += 1
-                
-                # Check for files if enabled
-                if self.settings['FILE_FORWARDING_ENABLED']:
-                    file_info = await self.check_file_extension(message)
-                    if file_info:
-                        file_info['message'] = message
-                        success = await self.forward_content(
-                            file_info,
-                            channel['title'],
-                            'file'
-                        )
-                        if success:
-                            channel_stats['files_forwarded'] += 1
-                            self.scan_stats['files_forwarded'] += 1
-                
-                # Rate limiting
-                await asyncio.sleep(self.settings['DELAY_BETWEEN_MESSAGES'])
-            
             # Log channel scan results
             if channel_stats['servers_found'] > 0 or channel_stats['files_forwarded'] > 0:
                 await self.log_message(
@@ -344,18 +871,240 @@ class VPNScanner:
                     f"📁 Files forwarded: {channel_stats['files_forwarded']}"
                 )
                 
+        except errors.FloodWaitError as e:
+            # The account is now paused; its channels move to other accounts until it recovers
+            await self.log_message(f"🌊 {account.name} flood-waited {e.seconds}s on {channel['title']}")
         except Exception as e:
             await self.log_message(f"❌ Error scanning {channel['title']}: {e}")
         
         return channel_stats
     
+    async def backfill_page(self, channel, offset_id, limit):
+        """Process up to limit messages older than offset_id, oldest id processed last"""
+        account = self.accounts.account_for(channel['id'])
+        channel_stats = {
+            'servers_found': 0,
+            'files_forwarded': 0,
+            'messages_scanned': 0
+        }
+        
+        fetched = {'count': 0}
+        
+        async def page():
+            with self.metrics.time('backfill_page', channel['id']):
+                # Charged one token per underlying 100-message request
+                messages = await account.call_background(
+                    -(-limit // 100),
+                    account.client.get_messages,
+                    channel['id'],
+                    limit=limit,
+                    offset_id=offset_id
+                )
+            fetched['count'] = len(messages)
+            records = [MessageRecord.from_message(message) for message in messages]
+            del messages
+            for record in records:
+                yield record
+        
+        try:
+            oldest = await self.scan_messages(page(), channel, channel_stats, account)
+            return fetched['count'], oldest or offset_id
+        except Exception as e:
+            await self.log_message(f"❌ Backfill error in {channel['title']}: {e}")
+            return None
+    
+    async def run_backfill(self, channels):
+        """Backfill channels, then report what the history yielded"""
+        servers_before = self.scan_stats['servers_found']
+        files_before = self.scan_stats['files_forwarded']
+        await self.backfill.run(
+            channels,
+            self.backfill_page,
+            # Start just below the newest message live scanning has processed
+            lambda channel: (self.cursors.get(channel['id']) or 0)
+        )
+        await self.log_message(
+            f"⏪ **Backfill Complete**\n\n"
+            f"📺 Channels: {len(channels)}\n"
+            f"📊 Messages scanned: {self.backfill.messages}\n"
+            f"🔒 Servers found: {self.scan_stats['servers_found'] - servers_before}\n"
+            f"📁 Files forwarded: {self.scan_stats['files_forwarded'] - files_before}"
+        )
+    
+    def start_backfill(self, channels):
+        self.supervisor.start('backfill', self.run_backfill(channels))
+    
+    async def stop_backfill(self):
+        """Cancel a running backfill, keeping each channel's cursor"""
+        # A page cut short is simply fetched again, so no grace period is needed
+        if not await self.supervisor.stop('backfill', grace=0):
+            return False
+        self.backfill.queue = []
+        self.backfill.save()
+        return True
+    
+    async def handle_backfill_command(self, args):
+        """vpn:backfill [CHANNEL_ID ...|stop]"""
+        if args and args[0] == 'stop':
+            if await self.stop_backfill():
+                await self.log_message("⏹️ **Backfill stopped** (resumes from the same point next time)")
+            else:
+                await self.log_message("ℹ️ **No backfill running**")
+            return
+        
+        if self.supervisor.running('backfill'):
+            await self.log_message("⚠️ **Backfill already running!**")
+            return
+        if not self.target_group_id and not self.sink_only():
+            await self.log_message("❌ **No target group set! Use vpn:set_target command first.**")
+            return
+        
+        channels = await self.get_channels_list()
+        if args:
+            wanted = {int(arg) for arg in args}
+            channels = [channel for channel in channels if channel['id'] in wanted]
+        channels = [channel for channel in channels if not self.backfill.done(channel['id'])]
+        if not channels:
+            await self.log_message("ℹ️ **Nothing to backfill**")
+            return
+        
+        self.start_backfill(channels)
+        await self.log_message(
+            f"⏪ **Backfill Started**\n\n"
+            f"📺 Channels: {len(channels)}\n"
+            f"🎯 Target: {self.settings['BACKFILL_MESSAGES_PER_MINUTE']} messages/min"
+        )
+    
+    async def scan_channels_sequentially(self, channels):
+        """Scan channels one at a time with the fixed channel delay"""
+        for channel in channels:
+            if not self.scanning:
+                break
+                
+            yield channel, await self.scan_channel(channel)
+            
+            # Delay between channels
+            with self.metrics.time('pacing_sleep'):
+                await self.supervisor.sleep(self.settings['DELAY_BETWEEN_CHANNELS'])
+    
+    async def scan_channels_concurrently(self, channels):
+        """Scan channels in parallel, bounded by SCAN_CONCURRENCY per account"""
+        async def scan(channel):
+            account = self.accounts.account_for(channel['id'])
+            async with account.semaphore:
+                if not self.scanning:
+                    return None
+                return channel, await self.scan_channel(channel, account)
+        
+        tasks = [asyncio.create_task(scan(channel)) for channel in channels]
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                if result is not None:
+                    yield result
+        finally:
+            # A cancelled scan must not leave its channel tasks running
+            for task in tasks:
+                task.cancel()
+    
+    async def scan_batch(self, channels):
+        """Scan a set of channels once and feed their yield to the scheduler"""
+        scan_results = {
+            'channels_scanned': 0,
+            'total_servers': 0,
+            'total_files': 0
+        }
+        
+        if self.concurrent_scanning():
+            channel_results = self.scan_channels_concurrently(channels)
+        else:
+            channel_results = self.scan_channels_sequentially(channels)
+        
+        recorded = set()
+        # Backfill pauses between pages while live channels are scanned
+        self.backfill.idle.clear()
+        try:
+            with self.metrics.time('scan_cycle'):
+                async for channel, stats in channel_results:
+                    scan_results['channels_scanned'] += 1
+                    scan_results['total_servers'] += stats['servers_found']
+                    scan_results['total_files'] += stats['files_forwarded']
+                    self.channel_scheduler.record(
+                        channel['id'],
+                        stats['messages_scanned'],
+                        stats['servers_found'] + stats['files_forwarded']
+                    )
+                    recorded.add(channel['id'])
+        finally:
+            self.backfill.idle.set()
+        
+        # Channels skipped by a stop keep their place in the schedule
+        for channel in channels:
+            if channel['id'] not in recorded:
+                self.channel_scheduler.reschedule(channel['id'])
+        
+        return scan_results
+    
+    def scan_interval(self):
+        """Seconds between polling cycles
+
+        With real-time ingestion active, polling is only a reconciliation
+        sweep that catches messages missed while disconnected.
+        """
+        if self.realtime_channels:
+            return self.settings['RECONCILE_INTERVAL']
+        if self.adaptive_scheduling():
+            # Wake for the next due channel, but at least every SCAN_INTERVAL to pick up new ones
+            next_due = self.channel_scheduler.seconds_until_next()
+            if next_due is not None:
+                return max(1, min(int(next_due) + 1, self.settings['SCAN_INTERVAL']))
+        return self.settings['SCAN_INTERVAL']
+    
+    def adaptive_scheduling(self):
+        """Whether channels are polled on per-channel yield-based intervals"""
+        return self.settings['ADAPTIVE_SCHEDULING'] and not self.realtime_channels
+    
+    def enable_realtime(self, channels):
+        """Subscribe to new posts in the given channels"""
+        self.disable_realtime()
+        self.realtime_channels = {channel['id']: channel for channel in channels}
+        if self.realtime_channels:
+            self.client.add_event_handler(
+                self.handle_channel_message,
+                events.NewMessage(chats=list(self.realtime_channels))
+            )
+    
+    def disable_realtime(self):
+        """Drop the real-time subscription"""
+        self.client.remove_event_handler(self.handle_channel_message)
+        self.realtime_channels = {}
+    
+    async def handle_channel_message(self, event):
+        """Push a new channel post through the same pipeline as scan_channel"""
+        channel = self.realtime_channels.get(event.chat_id)
+        if not channel or not self.scanning:
+            return
+        
+        channel_stats = {
+            'servers_found': 0,
+            'files_forwarded': 0,
+            'messages_scanned': 0
+        }
+        try:
+            await self.process_message(event.message, channel, channel_stats)
+            # Only advance over contiguous ids so the sweep still sees any gap
+            if event.message.id == (self.cursors.get(channel['id']) or 0) + 1:
+                self.record_progress(channel['id'], event.message.id)
+        except Exception as e:
+            await self.log_message(f"❌ Real-time error in {channel['title']}: {e}")
+    
     async def start_scanning(self):
-        """Start the main scanning loop"""
-        if self.scanning:
+        """Start the main scanning loop as a supervised task"""
+        if self.scanning or self.supervisor.running('scan'):
             await self.log_message("⚠️ **Scanner already running!**")
             return
             
-        if not self.target_group_id:
+        if not self.target_group_id and not self.sink_only():
             await self.log_message("❌ **No target group set! Use vpn:set_target command first.**")
             return
         
@@ -372,32 +1121,45 @@ class VPNScanner:
         channels = await self.get_channels_list()
         await self.log_message(f"📡 Found {len(channels)} channels to scan")
         
+        if self.settings['REAL_TIME_MODE']:
+            self.enable_realtime(channels)
+        
+        self.supervisor.start('scan', self.scan_loop(channels))
+    
+    async def scan_loop(self, channels):
+        """Scan until stopped; every wait returns as soon as a stop is requested"""
+        dialogs_version = self.dialogs.version
+        
         # Main scanning loop
         while self.scanning:
             try:
                 scan_start = datetime.now()
-                scan_results = {
-                    'channels_scanned': 0,
-                    'total_servers': 0,
-                    'total_files': 0
-                }
+                self.seen_index.prune()
+                if self.archive is not None:
+                    await self.archive.prune()
                 
-                # Scan each channel
-                for channel in channels:
-                    if not self.scanning:
-                        break
-                        
-                    stats = await self.scan_channel(channel)
-                    scan_results['channels_scanned'] += 1
-                    scan_results['total_servers'] += stats['servers_found']
-                    scan_results['total_files'] += stats['files_forwarded']
-                    
-                    # Delay between channels
-                    await asyncio.sleep(self.settings['DELAY_BETWEEN_CHANNELS'])
+                # Pick up channels joined or left since the last cycle
+                if self.dialogs.version != dialogs_version:
+                    dialogs_version = self.dialogs.version
+                    channels = await self.get_channels_list()
+                    await self.log_message(f"📡 Channel list updated: {len(channels)} channels to scan")
+                
+                # Adaptive mode scans only the channels that are due
+                if self.adaptive_scheduling():
+                    self.channel_scheduler.sync(channels)
+                    batch = self.channel_scheduler.pop_due()
+                    if not batch:
+                        await self.supervisor.sleep(self.scan_interval())
+                        continue
+                else:
+                    batch = channels
+                
+                scan_results = await self.scan_batch(batch)
                 
                 # Update scan statistics
                 self.scan_stats['total_scans'] += 1
                 self.scan_stats['last_scan'] = datetime.now()
+                self.checkpoint()
                 
                 # Log scan completion
                 scan_duration = datetime.now() - scan_start
@@ -407,16 +1169,16 @@ class VPNScanner:
                     f"📺 Channels: {scan_results['channels_scanned']}\n"
                     f"🔒 Servers found: {scan_results['total_servers']}\n"
                     f"📁 Files forwarded: {scan_results['total_files']}\n\n"
-                    f"⏳ Next scan in {self.settings['SCAN_INTERVAL']} seconds"
+                    f"⏳ Next scan in {self.scan_interval()} seconds"
                 )
                 
                 # Wait for next scan
                 if self.scanning:
-                    await asyncio.sleep(self.settings['SCAN_INTERVAL'])
+                    await self.supervisor.sleep(self.scan_interval())
                     
             except Exception as e:
                 await self.log_message(f"❌ **Critical scan error:** {e}")
-                await asyncio.sleep(30)  # Wait before retrying
+                await self.supervisor.sleep(30)  # Wait before retrying
     
     async def stop_scanning(self):
         """Stop the scanning process"""
@@ -425,6 +1187,11 @@ class VPNScanner:
             return
             
         self.scanning = False
+        self.disable_realtime()
+        await self.supervisor.stop('scan')
+        # Queued items go out on the batcher's timer (and stay journaled until
+        # then); flushing here would hold control_lock behind the rate limiter
+        self.checkpoint()
         runtime = datetime.now() - self.scan_stats['start_time']
         
         await self.log_message(
@@ -456,33 +1223,193 @@ class VPNScanner:
                 f"🎯 Target group: {'Set' if self.target_group_id else 'Not set'}"
             )
         
+        api_stats = self.scheduler.stats
+        status += (
+            f"\n\n🚦 **API Scheduler**\n"
+            f"📞 Calls: {api_stats['calls']} (rate {self.scheduler.rate * 60:.0f}/min)\n"
+            f"🌊 FloodWaits: {api_stats['flood_waits']} ({api_stats['flood_wait_seconds']} seconds)\n"
+            f"🔁 Retries: {api_stats['retries']} | ❌ Failures: {api_stats['failures']}"
+        )
+        
+        if self.supervisor.running('backfill'):
+            current = self.backfill.current
+            cursor = self.backfill.cursor(current['id']) if current else None
+            status += (
+                f"\n\n⏪ **Backfill** {'running' if self.backfill.idle.is_set() else 'paused for live scan'}\n"
+                f"📺 Channels left: {len(self.backfill.queue)}"
+                f"{' (now ' + current['title'] + ')' if current else ''}\n"
+                f"📊 Messages: {self.backfill.messages} "
+                f"({self.backfill.rate():.0f}/min, target {self.settings['BACKFILL_MESSAGES_PER_MINUTE']}/min)\n"
+            )
+            if cursor:
+                status += f"🔖 At message {cursor['offset']} ({cursor['messages']} from this channel)"
+        
+        if self.archive is not None:
+            status += f"\n\n🗄️ **Archive:** {len(self.archive)} configs"
+        
+        if len(self.accounts) > 1:
+            assigned = self.accounts.assignments([c['id'] for c in self.dialogs.channels()])
+            status += "\n\n👥 **Accounts**\n"
+            for account in self.accounts:
+                state = "ready" if account.available(self.accounts.failover_wait) else "unavailable"
+                status += (
+                    f"• {account.name}: {state}, {assigned[account.name]} channels, "
+                    f"{account.scheduler.stats['flood_waits']} FloodWaits\n"
+                )
+        
+        if len(self.channel_scheduler):
+            status += "\n\n📈 **Top Channels by Yield**\n"
+            for schedule in self.channel_scheduler.top():
+                status += (
+                    f"• {schedule.channel['title']}: {schedule.config_rate:.1f} configs/h, "
+                    f"{schedule.message_rate:.1f} msgs/h, every {schedule.interval / 60:.0f} min\n"
+                )
+        
         await self.log_message(status)
     
+    def metric_totals(self):
+        """Counters and gauges exported next to the stage histograms"""
+        counters = {
+            'servers_found': self.scan_stats['servers_found'],
+            'files_forwarded': self.scan_stats['files_forwarded'],
+            'scans': self.scan_stats['total_scans']
+        }
+        counters.update({f"api_{key}": value for key, value in self.scheduler.stats.items()})
+        gauges = {
+            'scanning': int(self.scanning),
+            'channels': len(self.dialogs.channels()),
+            'api_rate_per_minute': round(self.scheduler.rate * 60, 2)
+        }
+        return counters, gauges
+    
+    async def serve_metrics(self, headers):
+        """Prometheus scrape endpoint"""
+        counters, gauges = self.metric_totals()
+        body = self.metrics.render(counters, gauges).encode()
+        return 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}, body
+    
+    async def show_stats(self):
+        """Show per-stage timing percentiles"""
+        if not self.metrics.stages:
+            await self.log_message("ℹ️ **No timings recorded yet**")
+            return
+        
+        stats_text = "⏱️ **Stage Timings** (p50 / p90 / p99, ms)\n\n"
+        for stage, histogram in sorted(self.metrics.stages.items()):
+            p50, p90, p99 = (histogram.percentile(q) * 1000 for q in (0.5, 0.9, 0.99))
+            stats_text += (
+                f"• {stage}: {p50:.1f} / {p90:.1f} / {p99:.1f} "
+                f"({histogram.count} samples, {histogram.sum:.1f}s total)\n"
+            )
+        
+        titles = {channel['id']: channel['title'] for channel in self.dialogs.channels()}
+        slowest = self.metrics.slowest_channels()
+        if slowest:
+            stats_text += "\n🐢 **Slowest Channels**\n"
+            for channel_id, seconds in slowest:
+                stats_text += f"• {titles.get(channel_id, channel_id)}: {seconds:.1f}s\n"
+        
+        await self.log_message(stats_text)
+    
+    async def search_archive(self, query):
+        """Reply with the archived configs matching a query"""
+        if self.archive is None:
+            await self.call_api(self.client.send_message, 'me', "❌ Archive is disabled (ARCHIVE_ENABLED)")
+            return
+        
+        start = time.perf_counter()
+        try:
+            rows = await self.archive.search(query)
+        except ValueError as e:
+            await self.call_api(self.client.send_message, 'me', f"❌ Invalid search: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        
+        header = f"🔎 **Search:** `{query or '*'}` ({len(rows)} results, {elapsed:.0f} ms)\n\n"
+        entries = []
+        for server_type, host, port, source, config_text, first_seen, last_seen, seen_count in rows:
+            seen = datetime.fromtimestamp(last_seen).strftime('%Y-%m-%d %H:%M')
+            location = f"{host}:{port}" if host else "unparsed"
+            entries.append(
+                f"• **{server_type}** {location} | {source} | last seen {seen} (×{seen_count})\n"
+                f"```\n{config_text}\n```\n"
+            )
+        if not entries:
+            entries.append("No matching configs")
+        for text in pack_entries(header, entries):
+            await self.call_api(self.client.send_message, 'me', text)
+    
+    async def export_archive(self, query):
+        """Send the archived configs matching a query as a text file, one per line"""
+        if self.archive is None:
+            await self.call_api(self.client.send_message, 'me', "❌ Archive is disabled (ARCHIVE_ENABLED)")
+            return
+        
+        try:
+            limit = self.settings['ARCHIVE_EXPORT_LIMIT']
+            rows = await self.archive.search(query, limit=limit, max_limit=limit)
+        except ValueError as e:
+            await self.call_api(self.client.send_message, 'me', f"❌ Invalid search: {e}")
+            return
+        if not rows:
+            await self.call_api(self.client.send_message, 'me', "ℹ️ No matching configs")
+            return
+        
+        export = io.BytesIO('\n'.join(row[4] for row in rows).encode('utf-8') + b'\n')
+        export.name = f"vpn_configs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        await self.call_api(
+            self.client.send_file,
+            'me',
+            export,
+            caption=f"📦 **Export:** `{query or '*'}` ({len(rows)} configs)"
+        )
+    
     @events.register(events.NewMessage(chats='me'))
     async def handle_commands(self, event):
-        """Handle commands from saved messages"""
+        """Queue commands from saved messages for the command workers"""
         if not event.text or not event.text.startswith(config.COMMAND_PREFIX):
             return
-            
+        
+        # Returning at once keeps the client's update dispatch (and real-time posts) flowing
+        if not self.commands.submit(event):
+            await self.log_message(f"⚠️ **Too many pending commands, ignored:** {event.text.split()[0]}")
+    
+    async def run_command(self, event):
+        """Run one command from saved messages"""
         text = event.text.strip()
         command_parts = text.split()
         command = command_parts[0]
         
         try:
             if command == config.COMMANDS['start']:
-                asyncio.create_task(self.start_scanning())
+                async with self.control_lock:
+                    await self.start_scanning()
                 
             elif command == config.COMMANDS['stop']:
-                await self.stop_scanning()
+                async with self.control_lock:
+                    await self.stop_scanning()
                 
             elif command == config.COMMANDS['restart']:
-                await self.stop_scanning()
-                await asyncio.sleep(5)
-                asyncio.create_task(self.start_scanning())
+                # The old loop is gone once stop_scanning returns, so no settling delay
+                async with self.control_lock:
+                    await self.stop_scanning()
+                    await self.start_scanning()
                 
             elif command == config.COMMANDS['status']:
                 await self.show_status()
                 
+            elif command == config.COMMANDS['stats']:
+                await self.show_stats()
+                
+            elif command == config.COMMANDS['backfill']:
+                await self.handle_backfill_command(command_parts[1:])
+                
+            elif command == config.COMMANDS['search']:
+                await self.search_archive(text[len(command):].strip())
+                
+            elif command == config.COMMANDS['export']:
+                await self.export_archive(text[len(command):].strip())
+                
             elif command == config.COMMANDS['groups']:
                 groups = await self.get_groups_list()
                 groups_text = "📋 **Available Groups:**\n\n"
@@ -491,7 +1418,7 @@ class VPNScanner:
                     groups_text += f"   ID: `{group['id']}`\n"
                     groups_text += f"   Members: {group['participants']}\n\n"
                 groups_text += f"\nUse `{config.COMMANDS['set_target']} GROUP_ID` to set target"
-                await self.client.send_message('me', groups_text)
+                await self.call_api(self.client.send_message, 'me', groups_text)
                 
             elif command == config.COMMANDS['set_target'] and len(command_parts) > 1:
                 try:
@@ -500,7 +1427,7 @@ class VPNScanner:
                     await self.save_target_group(group_id)
                     await self.log_message(f"✅ **Target group set to:** {group_id}")
                 except ValueError:
-                    await self.client.send_message('me', "❌ Invalid group ID format")
+                    await self.call_api(self.client.send_message, 'me', "❌ Invalid group ID format")
                     
             elif command == config.COMMANDS['toggle_files']:
                 self.settings['FILE_FORWARDING_ENABLED'] = not self.settings['FILE_FORWARDING_ENABLED']
@@ -508,6 +1435,16 @@ class VPNScanner:
                 status = "enabled" if self.settings['FILE_FORWARDING_ENABLED'] else "disabled"
                 await self.log_message(f"📁 **File forwarding {status}**")
                 
+            elif command == config.COMMANDS['toggle_realtime']:
+                self.settings['REAL_TIME_MODE'] = not self.settings['REAL_TIME_MODE']
+                await self.save_settings()
+                if not self.settings['REAL_TIME_MODE']:
+                    self.disable_realtime()
+                elif self.scanning:
+                    self.enable_realtime(await self.get_channels_list())
+                status = "enabled" if self.settings['REAL_TIME_MODE'] else "disabled"
+                await self.log_message(f"⚡ **Real-time mode {status}**")
+                
             elif command == config.COMMANDS['settings']:
                 await self.show_settings()
                 
@@ -515,7 +1452,7 @@ class VPNScanner:
             elif '=' in text and not text.startswith(config.COMMAND_PREFIX):
                 await self.handle_setting_change(text)
                 
-            await event.delete()
+            await self.call_api(event.delete)
             
         except Exception as e:
             await self.log_message(f"❌ Command error: {e}")
@@ -528,14 +1465,16 @@ class VPNScanner:
             f"📺 Channel delay: {self.settings['DELAY_BETWEEN_CHANNELS']} seconds\n"
             f"💬 Message delay: {self.settings['DELAY_BETWEEN_MESSAGES']} seconds\n"
             f"📊 Max messages per scan: {self.settings['MAX_MESSAGES_PER_SCAN']}\n"
-            f"📁 File forwarding: {'Enabled' if self.settings['FILE_FORWARDING_ENABLED'] else 'Disabled'}\n\n"
+            f"📁 File forwarding: {'Enabled' if self.settings['FILE_FORWARDING_ENABLED'] else 'Disabled'}\n"
+            f"⚡ Real-time mode: {'Enabled' if self.settings['REAL_TIME_MODE'] else 'Disabled'}"
+            f" (sweep every {self.settings['RECONCILE_INTERVAL']} seconds)\n\n"
             f"**Enabled servers:** {', '.join(self.settings['ENABLED_SERVER_TYPES'])}\n"
             f"**File extensions:** {', '.join(self.settings['ENABLED_FILE_EXTENSIONS'])}\n\n"
             f"**To change settings, send:**\n"
             f"`SCAN_INTERVAL = 120`\n"
             f"`ENABLED_SERVER_TYPES = vmess,vless,ss`"
         )
-        await self.client.send_message('me', settings_text)
+        await self.call_api(self.client.send_message, 'me', settings_text)
     
     async def handle_setting_change(self, text):
         """Handle setting changes"""
@@ -551,11 +1490,13 @@ class VPNScanner:
                     self.settings[key] = value.lower() in ['true', '1', 'yes', 'on']
                 elif isinstance(self.settings[key], int):
                     self.settings[key] = int(value)
+                
+                self.apply_settings()
                     
                 await self.save_settings()
                 await self.log_message(f"✅ **Updated {key}:** {self.settings[key]}")
             else:
-                await self.client.send_message('me', f"❌ Unknown setting: {key}")
+                await self.call_api(self.client.send_message, 'me', f"❌ Unknown setting: {key}")
                 
         except Exception as e:
             await self.log_message(f"❌ Setting change error: {e}")
@@ -563,8 +1504,15 @@ class VPNScanner:
     async def run(self):
         """Main run function"""
         await self.start()
+        await self.replay_journal()
+        
+        # Resume a backfill interrupted by a restart
+        if self.backfill.queue and (self.target_group_id or self.sink_only()):
+            queued = set(self.backfill.queue)
+            self.start_backfill([c for c in await self.get_channels_list() if c['id'] in queued])
         
         # Register event handler
+        self.commands.start()
         self.client.add_event_handler(self.handle_commands)
         
         await self.log_message("🤖 **VPN Scanner Ready**")
@@ -587,8 +1535,29 @@ async def main():
         if scanner.log_channel_id:
             await scanner.log_message(f"❌ **Critical system error:** {e}")
     finally:
+        scanner.commands.close()
+        await scanner.supervisor.stop_all()
+        if scanner.metrics_server is not None:
+            scanner.metrics_server.stop()
+        if scanner.sink_server is not None:
+            scanner.sink_server.stop()
+        for account in scanner.accounts.workers():
+            account.dialogs.stop()
+            if account.client.is_connected():
+                await account.client.disconnect()
         if scanner.client.is_connected():
+            await scanner.batcher.close()
+            await scanner.outbound.close()
             await scanner.client.disconnect()
+        scanner.checkpoint()
+        scanner.journal.close()
+        scanner.seen_index.close()
+        scanner.document_cache.close()
+        scanner.extraction_pool.close()
+        if scanner.sink is not None:
+            scanner.sink.close()
+        if scanner.archive is not None:
+            scanner.archive.close()
         print("👋 Disconnected from Telegram")
 
 if __name__ == "__main__":